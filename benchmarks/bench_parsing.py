@@ -0,0 +1,73 @@
+"""Time parsing each site's results page before and after the parser layer
+
+Usage: python -m benchmarks.bench_parsing pararius=page.html vbo=page.html
+"""
+
+import argparse
+import json
+import statistics
+import time
+from bs4 import BeautifulSoup
+from househunt.parsing import HTML_PARSER, make_soup
+from househunt.sites import SITES
+
+
+def time_call(func, repeat):
+    """median seconds of repeated calls and the last result"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def bench_site(site, html_content, repeat):
+    """parse time of the full html.parser tree against the strained tree"""
+    spec = SITES[site]
+    before, before_items = time_call(
+        lambda: BeautifulSoup(html_content, "html.parser").select(
+            spec.container.pattern
+        ),
+        repeat,
+    )
+    after, after_items = time_call(
+        lambda: spec.container.select(make_soup(html_content, spec.strainer)), repeat
+    )
+    return {
+        "site": site,
+        "bytes": len(html_content),
+        "items_before": len(before_items),
+        "items_after": len(after_items),
+        "before_ms": round(before * 1000, 3),
+        "after_ms": round(after * 1000, 3),
+        "parser": HTML_PARSER,
+        "speedup": round(before / after, 2) if after else None,
+    }
+
+
+def main():
+    """parse command line pages and report the timings"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("pages", nargs="+", help="site=path of a saved results page")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print json lines")
+    args = parser.parse_args()
+
+    for page in args.pages:
+        site, path = page.split("=", 1)
+        with open(path, encoding="utf-8") as html_file:
+            result = bench_site(site, html_file.read(), args.repeat)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{site}: {result['before_ms']} ms -> {result['after_ms']} ms "
+                f"({result['speedup']}x, {result['items_after']} listings, "
+                f"{result['parser']})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Time the steps of a run on the recorded results pages in benchmarks/fixtures
+
+Extraction per site, building the DataFrame and finding the new listings
+among synthetic sets of existing listings, both with pandas isin as the
+scripts used to and with the local seen index.
+
+Usage: python -m benchmarks.bench_pipeline --json > results.jsonl
+"""
+
+import argparse
+import json
+import os
+import platform
+import pandas as pd
+from benchmarks.bench_parsing import time_call
+from househunt.listing import ListingBatch
+from househunt.normalize import normalize_listings
+from househunt.parsing import HTML_PARSER
+from househunt.seen_index import SeenIndex
+from househunt.sites import SITES, extract_listings
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+EXISTING_SIZES = (1_000, 10_000, 100_000)
+
+
+def load_fixtures(sites):
+    """html of the recorded results page of every site"""
+    fixtures = {}
+    for site in sites:
+        with open(os.path.join(FIXTURES_DIR, f"{site}.html"), encoding="utf-8") as f:
+            fixtures[site] = f.read()
+    return fixtures
+
+
+def existing_urls(size, new_listings_df):
+    """synthetic urls already in the sheet, half of the new listings among them"""
+    urls = [f"https://www.example.nl/koopwoning/{number}" for number in range(size)]
+    urls[: len(new_listings_df) // 2] = new_listings_df["URL"][::2]
+    return urls
+
+
+def bench_extract(site, html_content, repeat):
+    """time reading every listing of a site's results page"""
+    seconds, batch = time_call(
+        lambda: _extracted(SITES[site], html_content), repeat
+    )
+    return {"step": "extract", "site": site, "items": len(batch)}, seconds, batch
+
+
+def _extracted(spec, html_content):
+    batch = ListingBatch()
+    extract_listings(spec, html_content, batch)
+    return batch
+
+
+def bench_dedup(new_listings_df, size, repeat):
+    """time finding the new listings among existing ones with pandas and
+    with the seen index"""
+    urls = existing_urls(size, new_listings_df)
+    existing_df = pd.DataFrame({"URL": urls})
+    isin_seconds, isin_new = time_call(
+        lambda: new_listings_df[~new_listings_df["URL"].isin(existing_df["URL"])],
+        repeat,
+    )
+    seen_index = SeenIndex(":memory:")
+    seen_index.add(urls)
+    index_seconds, index_new = time_call(
+        lambda: seen_index.filter_new(new_listings_df), repeat
+    )
+    seen_index.close()
+    return [
+        ({"step": "dedup_isin", "existing": size, "items": len(isin_new)}, isin_seconds),
+        (
+            {"step": "dedup_seen_index", "existing": size, "items": len(index_new)},
+            index_seconds,
+        ),
+    ]
+
+
+def run(sites, repeat):
+    """results of every step as a list of dicts"""
+    environment = {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "parser": HTML_PARSER,
+        "repeat": repeat,
+    }
+    results = []
+    batch = ListingBatch()
+    for site, html_content in load_fixtures(sites).items():
+        result, seconds, site_batch = bench_extract(site, html_content, repeat)
+        results.append((result, seconds))
+        batch.extend(site_batch)
+
+    seconds, new_listings_df = time_call(batch.to_dataframe, repeat)
+    results.append(({"step": "dataframe", "items": len(new_listings_df)}, seconds))
+
+    seconds, typed_df = time_call(lambda: normalize_listings(new_listings_df), repeat)
+    results.append(({"step": "normalize", "items": len(typed_df)}, seconds))
+
+    for size in EXISTING_SIZES:
+        results.extend(bench_dedup(new_listings_df, size, repeat))
+
+    return [
+        {**result, "median_ms": round(seconds * 1000, 3), **environment}
+        for result, seconds in results
+    ]
+
+
+def main():
+    """run the benchmarks and report the timings"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sites", nargs="+", default=list(SITES), choices=list(SITES)
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print json lines")
+    args = parser.parse_args()
+
+    for result in run(args.sites, args.repeat):
+        if args.json:
+            print(json.dumps(result))
+        else:
+            label = result.get("site") or result.get("existing", "")
+            print(
+                f"{result['step']:<18} {label!s:<9} {result['median_ms']:>9} ms "
+                f"({result['items']} listings)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Time syncing listings to a local stand-in of the Google Sheet
+
+Appends synthetic listings with several batch sizes to a local sheet that
+already holds existing rows, with optional latency and quota per call.
+
+Usage: python -m benchmarks.bench_sheet_sync --rows 5000 --latency 0.3 --json
+"""
+
+import argparse
+import json
+import time
+import pandas as pd
+from househunt.listing import LISTING_FIELDS, SHEET_COLUMNS
+from househunt.sheet_backends import LocalSheet, ThrottledSheet
+from househunt.sheet_sync import SheetSync
+
+HEADER = [SHEET_COLUMNS[name] for name in LISTING_FIELDS]
+
+
+def synthetic_listings(count, start=0):
+    """DataFrame of made up listings with the sheet columns"""
+    numbers = range(start, start + count)
+    return pd.DataFrame(
+        {
+            "source": ["vbo"] * count,
+            "URL": [f"https://www.example.nl/koopwoning/{n}" for n in numbers],
+            "address": [f"Teststraat {n}" for n in numbers],
+            "price": ["€ 400.000 k.k."] * count,
+            "size": ["75 m²"] * count,
+            "energy_label": ["A"] * count,
+            "timestamp": ["2024-01-01 12:00:00"] * count,
+        }
+    ).reindex(columns=HEADER)
+
+
+def bench_batch_size(batch_size, args):
+    """sync new rows into a sheet holding the existing rows"""
+    local_sheet = LocalSheet(":memory:")
+    local_sheet.update(values=[HEADER], range_name="A1")
+    local_sheet.append_rows(
+        synthetic_listings(args.existing).values.tolist(), table_range="A1"
+    )
+    sheet = ThrottledSheet(local_sheet, args.latency, args.quota)
+    sheet_sync = SheetSync(sheet, batch_size=batch_size, batch_pause=args.pause)
+    # Half of the listings are in the sheet already
+    listings_df = synthetic_listings(args.rows, start=args.existing - args.rows // 2)
+
+    started = time.perf_counter()
+    sheet_sync.load()
+    loaded = time.perf_counter()
+    new_listings = sheet_sync.sync(listings_df)
+    synced = time.perf_counter()
+    return {
+        "batch_size": batch_size,
+        "existing": args.existing,
+        "rows": args.rows,
+        "new": len(new_listings),
+        "latency": args.latency,
+        "quota": args.quota,
+        "load_ms": round((loaded - started) * 1000, 3),
+        "sync_ms": round((synced - loaded) * 1000, 3),
+        "calls": sheet.calls,
+        "rejected": sheet.rejected,
+    }
+
+
+def main():
+    """run the benchmark for every batch size and report the timings"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--existing", type=int, default=10000)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[100, 500, 1000]
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--quota", type=int, default=0)
+    parser.add_argument("--pause", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="print json lines")
+    args = parser.parse_args()
+
+    for batch_size in args.batch_sizes:
+        result = bench_batch_size(batch_size, args)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"batch {batch_size}: load {result['load_ms']} ms, "
+                f"sync {result['sync_ms']} ms ({result['new']} new rows, "
+                f"{result['calls']} calls, {result['rejected']} rejected)"
+            )
+
+
+if __name__ == "__main__":
+    main()
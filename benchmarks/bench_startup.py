@@ -0,0 +1,74 @@
+"""Time the cold start of the scraper in fresh interpreters
+
+Usage: python -m benchmarks.bench_startup --repeat 10 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(ROOT_DIR, "benchmarks", "fixtures", "vbo.html")
+
+# Command lines started from scratch, the first is the bare interpreter
+COMMANDS = {
+    "python": [sys.executable, "-c", "pass"],
+    "import": [sys.executable, "-c", "import househunt.pipeline"],
+    "parse_only": [sys.executable, "-m", "househunt", "--parse-only", f"vbo={FIXTURE}"],
+}
+
+
+def time_command(command, repeat, cwd):
+    """median wall and cpu seconds of running the command to completion"""
+    wall, cpu = [], []
+    for _ in range(repeat):
+        usage = os.times()
+        started = time.perf_counter()
+        subprocess.run(
+            command,
+            cwd=cwd,
+            env={**os.environ, "PYTHONPATH": ROOT_DIR},
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        wall.append(time.perf_counter() - started)
+        after = os.times()
+        cpu.append(
+            after.children_user
+            - usage.children_user
+            + after.children_system
+            - usage.children_system
+        )
+    return statistics.median(wall), statistics.median(cpu)
+
+
+def main():
+    """run every command and report the timings"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print json lines")
+    args = parser.parse_args()
+
+    # Runs in an empty directory so no local .env, index or cache is picked up
+    with tempfile.TemporaryDirectory() as cwd:
+        for name, command in COMMANDS.items():
+            wall, cpu = time_command(command, args.repeat, cwd)
+            result = {
+                "step": name,
+                "wall_ms": round(wall * 1000, 1),
+                "cpu_ms": round(cpu * 1000, 1),
+                "python": sys.version.split()[0],
+            }
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(f"{name}: {result['wall_ms']} ms wall, {result['cpu_ms']} ms cpu")
+
+
+if __name__ == "__main__":
+    main()
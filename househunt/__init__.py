@@ -0,0 +1,7 @@
+"""Shared building blocks for the house hunting scrapers"""
+
+from dotenv import load_dotenv
+
+# Settings in .env apply to every module, which read the environment as
+# soon as they are imported
+load_dotenv()
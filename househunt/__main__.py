@@ -0,0 +1,5 @@
+"""Run the scrapers with python -m househunt"""
+
+from househunt.cli import main
+
+main()
@@ -0,0 +1,151 @@
+"""Request interception policy that keeps pages from loading unused assets"""
+
+import asyncio
+import os
+from collections import Counter
+from urllib.parse import urlsplit
+
+# Resource types the scrapers never read
+DEFAULT_BLOCKED_TYPES = ("image", "media", "font", "stylesheet")
+# Analytics and advertising hosts the result pages pull in
+DEFAULT_BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "facebook.net",
+    "hotjar.com",
+    "cookiebot.com",
+    "criteo.com",
+    "bing.com",
+)
+# Typical transfer size per resource type, used to estimate bytes saved
+# since blocked requests never report their size
+ESTIMATED_BYTES = {
+    "image": 60_000,
+    "media": 500_000,
+    "font": 40_000,
+    "stylesheet": 30_000,
+    "script": 50_000,
+}
+DEFAULT_ESTIMATED_BYTES = 10_000
+
+
+def _host_matches(host, hosts):
+    return any(host == h or host.endswith("." + h) for h in hosts)
+
+
+def _env_list(name):
+    value = os.environ.get(name)
+    if value is None:
+        return None
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+class ResourcePolicy:
+    """decides which requests a page may make
+
+    Allowlists win over everything else when given: only those resource types
+    or hosts load. Denylists block the listed types and hosts (including
+    their subdomains).
+    """
+
+    def __init__(
+        self,
+        block_types=DEFAULT_BLOCKED_TYPES,
+        allow_types=None,
+        block_hosts=DEFAULT_BLOCKED_HOSTS,
+        allow_hosts=None,
+    ):
+        self.block_types = frozenset(block_types)
+        self.allow_types = frozenset(allow_types) if allow_types else None
+        self.block_hosts = tuple(block_hosts)
+        self.allow_hosts = tuple(allow_hosts) if allow_hosts else None
+
+    @classmethod
+    def from_env(cls, site):
+        """policy for a site, overridable with <SITE>_BLOCK_TYPES,
+        <SITE>_ALLOW_TYPES, <SITE>_BLOCK_HOSTS and <SITE>_ALLOW_HOSTS"""
+        prefix = site.upper()
+        block_types = _env_list(f"{prefix}_BLOCK_TYPES")
+        block_hosts = _env_list(f"{prefix}_BLOCK_HOSTS")
+        return cls(
+            block_types=DEFAULT_BLOCKED_TYPES if block_types is None else block_types,
+            allow_types=_env_list(f"{prefix}_ALLOW_TYPES"),
+            block_hosts=DEFAULT_BLOCKED_HOSTS if block_hosts is None else block_hosts,
+            allow_hosts=_env_list(f"{prefix}_ALLOW_HOSTS"),
+        )
+
+    def allows(self, resource_type, url):
+        """whether a request of this type to this url may go through"""
+        host = urlsplit(url).hostname or ""
+        if self.allow_hosts is not None and not _host_matches(host, self.allow_hosts):
+            return False
+        if _host_matches(host, self.block_hosts):
+            return False
+        if self.allow_types is not None:
+            return resource_type in self.allow_types
+        return resource_type not in self.block_types
+
+
+class BlockingStats:
+    """per-run counts of the requests a policy let through or blocked"""
+
+    def __init__(self):
+        self.requests_allowed = 0
+        self.requests_blocked = 0
+        self.bytes_loaded = 0
+        self.bytes_saved_estimate = 0
+        self.blocked_by_type = Counter()
+
+    def record_blocked(self, resource_type):
+        """count a blocked request and its estimated size"""
+        self.requests_blocked += 1
+        self.blocked_by_type[resource_type] += 1
+        self.bytes_saved_estimate += ESTIMATED_BYTES.get(
+            resource_type, DEFAULT_ESTIMATED_BYTES
+        )
+
+    def reset(self):
+        """start counting a new run"""
+        self.__init__()
+
+    def summary(self):
+        """one line report of the counts"""
+        by_type = ", ".join(
+            f"{resource_type}: {count}"
+            for resource_type, count in self.blocked_by_type.most_common()
+        )
+        return (
+            f"{self.requests_blocked} requests blocked ({by_type or 'none'}), "
+            f"~{self.bytes_saved_estimate // 1024} KiB saved, "
+            f"{self.requests_allowed} requests allowed "
+            f"({self.bytes_loaded // 1024} KiB loaded)"
+        )
+
+
+async def apply_policy(page, policy, stats=None):
+    """intercept every request of the page and enforce the policy"""
+    stats = stats if stats is not None else BlockingStats()
+
+    async def handle(request):
+        try:
+            if policy.allows(request.resourceType, request.url):
+                stats.requests_allowed += 1
+                await request.continue_()
+            else:
+                stats.record_blocked(request.resourceType)
+                await request.abort()
+        except Exception:  # pylint: disable=broad-exception-caught
+            # The page navigated away or closed before the request was handled
+            pass
+
+    def count_response(response):
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            stats.bytes_loaded += int(length)
+
+    await page.setRequestInterception(True)
+    page.on("request", lambda request: asyncio.ensure_future(handle(request)))
+    page.on("response", count_response)
+    return stats
@@ -0,0 +1,121 @@
+"""Long-lived headless browser that hands out isolated pages to the scrapers"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from househunt.tracing import tracer
+
+# path will need to be changed in Python Anywhere
+BROWSER_EXECUTABLE_PATH = os.environ.get(
+    "BROWSER_EXECUTABLE_PATH", "chrome-win/chrome-win/chrome.exe"
+)
+# Maximum number of pages open at the same time
+BROWSER_MAX_PAGES = int(os.environ.get("BROWSER_MAX_PAGES", "3"))
+# Seconds to wait for the browser to answer a health check
+BROWSER_HEALTH_TIMEOUT = float(os.environ.get("BROWSER_HEALTH_TIMEOUT", "5"))
+
+
+class BrowserPool:
+    """one chromium process shared by every site scraper
+
+    Each page lives in its own incognito context so cookies and storage do
+    not leak between sites. The browser is health checked before a page is
+    handed out and relaunched when it crashed or stopped responding.
+    """
+
+    def __init__(
+        self,
+        max_pages=BROWSER_MAX_PAGES,
+        executable_path=BROWSER_EXECUTABLE_PATH,
+        args=None,
+    ):
+        self.max_pages = max_pages
+        self.executable_path = executable_path
+        self.args = args or ["--no-sandbox", "--disable-setuid-sandbox"]
+        self.launches = 0
+        self._browser = None
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(max_pages)
+
+    async def __aenter__(self):
+        # The browser is launched on the first page checkout, runs where
+        # every site is served over plain http never start it
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """shut the browser down"""
+        async with self._lock:
+            await self._shutdown()
+
+    async def healthy(self):
+        """check the browser process is alive and answering"""
+        browser = self._browser
+        if browser is None:
+            return False
+        process = browser.process
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            await asyncio.wait_for(browser.version(), BROWSER_HEALTH_TIMEOUT)
+        except Exception:  # pylint: disable=broad-exception-caught
+            return False
+        return True
+
+    @asynccontextmanager
+    async def page(self):
+        """borrow a fresh page in an incognito context of the shared browser"""
+        async with self._semaphore:
+            browser = await self._ensure_browser()
+            context = await browser.createIncognitoBrowserContext()
+            try:
+                yield await context.newPage()
+            finally:
+                try:
+                    await context.close()
+                except Exception:  # pylint: disable=broad-exception-caught
+                    # The browser went away while the page was in use, the
+                    # next checkout will notice and relaunch it
+                    pass
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if not await self.healthy():
+                if self._browser is not None:
+                    print("Browser is not responding, restarting it.")
+                await self._shutdown()
+                await self._launch()
+            return self._browser
+
+    async def _launch(self):
+        # pyppeteer is only imported once a site needs the browser
+        from pyppeteer import launch  # pylint: disable=import-error,import-outside-toplevel
+
+        with tracer.span("browser_launch"):
+            browser = await launch(
+                headless=True,
+                executablePath=self.executable_path,
+                args=self.args,
+                # The pool decides when the browser goes away, not the signals
+                handleSIGINT=False,
+                handleSIGTERM=False,
+                handleSIGHUP=False,
+            )
+        browser.on("disconnected", lambda: self._forget(browser))
+        self._browser = browser
+        self.launches += 1
+
+    def _forget(self, browser):
+        if self._browser is browser:
+            self._browser = None
+
+    async def _shutdown(self):
+        browser, self._browser = self._browser, None
+        if browser is None:
+            return
+        try:
+            await browser.close()
+        except Exception:  # pylint: disable=broad-exception-caught
+            pass
@@ -0,0 +1,108 @@
+"""Scrape the sites, register new listings in the Google Sheet and email them
+
+Usage: python -m househunt --sites pararius,vbo --backend http
+"""
+
+import argparse
+import asyncio
+from datetime import datetime
+from househunt.sites import SITES
+
+# Fetch backends that can be forced for every site
+BACKENDS = ("http", "pyppeteer", "selenium")
+
+
+def parse_sites(value):
+    """comma separated site names, checked against the known sites"""
+    sites = [site.strip() for site in value.split(",") if site.strip()]
+    unknown = sorted(set(sites) - set(SITES))
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown sites: {', '.join(unknown)}")
+    return sites
+
+
+def build_parser():
+    """command line options of every entry point"""
+    parser = argparse.ArgumentParser(prog="househunt", description=__doc__)
+    parser.add_argument(
+        "--sites",
+        type=parse_sites,
+        help=f"comma separated sites to scrape (defaults to {','.join(SITES)})",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        help="fetch every site with this backend instead of the configured ones",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep running and poll every site on its own interval",
+    )
+    parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="rebuild the local index of seen listings from the Google Sheet",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="scrape and print the new listings without touching the sheet or email",
+    )
+    parser.add_argument(
+        "--parse-only",
+        nargs="+",
+        metavar="SITE=PATH",
+        help="print the listings of saved results pages and exit",
+    )
+    parser.add_argument(
+        "--price-changes",
+        nargs="?",
+        const=7,
+        type=float,
+        metavar="DAYS",
+        help="print the price changes of the last days (7 when not given) and exit",
+    )
+    parser.add_argument(
+        "--gone-since",
+        type=datetime.fromisoformat,
+        metavar="DATE",
+        help="print the listings not seen anymore since a date, like 2024-05-01",
+    )
+    parser.add_argument(
+        "--same-property",
+        metavar="URL",
+        help="print the listings on every site linked to the property of a url",
+    )
+    parser.add_argument(
+        "--compact-history",
+        action="store_true",
+        help="shrink the local listing history to its changes and exit",
+    )
+    return parser
+
+
+def main(argv=None):
+    """run the pipeline as the command line asks"""
+    args = build_parser().parse_args(argv)
+
+    # The pipeline opens the local index and page cache, so it is only
+    # imported once the arguments are valid
+    from househunt import pipeline  # pylint: disable=import-outside-toplevel
+
+    if args.parse_only:
+        pipeline.parse_only(args.parse_only)
+    elif args.price_changes is not None:
+        pipeline.print_price_changes(args.price_changes)
+    elif args.gone_since is not None:
+        pipeline.print_gone_since(args.gone_since)
+    elif args.same_property:
+        pipeline.print_same_property(args.same_property)
+    elif args.compact_history:
+        pipeline.compact_history()
+    elif args.reconcile:
+        asyncio.run(pipeline.reconcile_seen_index())
+    elif args.daemon:
+        asyncio.run(pipeline.run_daemon(args.sites, args.backend))
+    else:
+        asyncio.run(pipeline.run_once(args.sites, args.backend, args.dry_run))
@@ -0,0 +1,32 @@
+"""Google Sheet and email settings of the scrapers, read from the environment"""
+
+import os
+
+# Load environment variables
+SPREADSHEET_ID = os.environ.get("SPREADSHEET_ID")
+GOOGLE_SHEETS_CREDENTIALS_PATH = os.getenv("GOOGLE_SHEETS_CREDENTIALS_PATH")
+SERVICE_ACCOUNT_FILE = (
+    GOOGLE_SHEETS_CREDENTIALS_PATH
+    if GOOGLE_SHEETS_CREDENTIALS_PATH
+    else "credentials.json"
+)
+SHEET_NAME = "Listings"
+SHEET_URL = f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/edit?gid=0#gid=0"
+
+# Email configuration
+SMTP_SERVER = os.environ.get("SMTP_SERVER")
+SMTP_PORT = os.environ.get("SMTP_PORT")
+EMAIL_USERNAME = os.environ.get("EMAIL_USERNAME")
+EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD")
+
+
+def email_recipients():
+    """addresses in the comma separated EMAIL_RECIPIENTS, empty when unset
+
+    The single EMAIL_RECIPIENT the selenium scraper used to read is still
+    accepted when EMAIL_RECIPIENTS is not set.
+    """
+    recipients = os.environ.get("EMAIL_RECIPIENTS") or os.environ.get(
+        "EMAIL_RECIPIENT", ""
+    )
+    return [address.strip() for address in recipients.split(",") if address.strip()]
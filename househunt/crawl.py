@@ -0,0 +1,100 @@
+"""Crawl every results page of a search with a bounded number of fetches in flight"""
+
+import asyncio
+import os
+from househunt.fetchers import NOT_MODIFIED
+from househunt.listing import ListingBatch
+from househunt.page_cache import content_hash
+from househunt.pagination import NextLink
+from househunt.parsing import make_soup
+from househunt.sites import extract_from_soup
+from househunt.tracing import tracer
+
+# Highest results page fetched per search
+MAX_PAGES = int(os.environ.get("MAX_PAGES", "5"))
+# Results pages of one search fetched at the same time
+PAGE_CONCURRENCY = int(os.environ.get("PAGE_CONCURRENCY", "3"))
+
+
+async def crawl(
+    spec,
+    url,
+    fetcher,
+    timestamp="",
+    all_seen=None,
+    max_pages=None,
+    concurrency=PAGE_CONCURRENCY,
+    page_cache=None,
+):
+    """listings of every results page of a search, None when the first page
+    could not be fetched
+
+    Crawling stops at the first page without listings or, when all_seen is
+    given, at the first page whose urls were all seen before. With a page
+    cache it also stops at the first page the server reports unchanged or
+    whose listing containers hash the same as last time, without reading
+    its listings.
+    """
+    max_pages = max_pages or MAX_PAGES
+    batch = ListingBatch()
+
+    def add_page(page_url, html_content):
+        """add a page's listings, returns whether to keep crawling"""
+        if html_content is None or html_content is NOT_MODIFIED:
+            return False
+        with tracer.span("parse"):
+            soup = make_soup(html_content, spec.strainer)
+        if page_cache is not None:
+            digest = content_hash(soup)
+            if page_cache.unchanged(page_url, digest):
+                return False
+            page_cache.stage(page_url, content_hash=digest)
+        page_batch = ListingBatch()
+        with tracer.span("extract"):
+            items = extract_from_soup(spec, soup, page_batch, timestamp)
+        tracer.count("items_parsed", len(page_batch))
+        # The page was read, a listing missing from it went offline
+        batch.pages[page_url] = list(page_batch.columns["url"])
+        if not items:
+            return False
+        batch.extend(page_batch)
+        return all_seen is None or not all_seen(page_batch.columns["url"])
+
+    first_page = await fetcher.fetch(url, spec.ready_selector)
+    if first_page is None:
+        return None
+    if not add_page(url, first_page) or spec.pagination is None or max_pages <= 1:
+        return batch
+
+    if isinstance(spec.pagination, NextLink):
+        # Every page is only known once the previous one arrived
+        html_content, page_url = first_page, url
+        for _ in range(max_pages - 1):
+            page_url = spec.pagination.next_url(html_content, page_url)
+            if page_url is None:
+                break
+            html_content = await fetcher.fetch(page_url, spec.ready_selector)
+            if not add_page(page_url, html_content):
+                break
+        return batch
+
+    last_page = min(max_pages, spec.pagination.page_count(first_page))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    page_urls = [spec.pagination.page_url(url, page) for page in range(2, last_page + 1)]
+
+    async def fetch_page(page_url):
+        async with semaphore:
+            return await fetcher.fetch(page_url, spec.ready_selector)
+
+    tasks = [asyncio.create_task(fetch_page(page_url)) for page_url in page_urls]
+    try:
+        # Pages are added in order so crawling stops at the right one
+        for page_url, task in zip(page_urls, tasks):
+            if not add_page(page_url, await task):
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return batch
@@ -0,0 +1,329 @@
+"""Pluggable page fetchers: plain http first, headless browser as fallback"""
+
+import asyncio
+import functools
+import os
+import re
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from househunt.blocking import apply_policy
+from househunt.offload import run_blocking
+from househunt.parsing import make_soup
+from househunt.tracing import tracer
+
+# Seconds before a plain http request is given up
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "20"))
+# Maximum number of pooled keep-alive connections
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "10"))
+# Milliseconds the browser waits for the expected selector
+BROWSER_WAIT_TIMEOUT = int(os.environ.get("BROWSER_WAIT_TIMEOUT", "30000"))
+
+HTTP_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "nl-NL,nl;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+
+# Selectors of a tag and a class, "li.search-list__item--listing", which
+# are checked on the raw html instead of a parsed page
+SIMPLE_SELECTOR = re.compile(r"^([a-zA-Z][a-zA-Z0-9]*)?\.([\w-]+)$")
+
+# Returned instead of the html when the server answered 304 Not Modified
+NOT_MODIFIED = object()
+# Statuses of a server asking us to slow down
+THROTTLED_STATUSES = (429, 503)
+
+
+class FetchError(Exception):
+    """a fetch that failed for a reason that may pass, worth retrying
+
+    throttled is set when the server asked us to slow down, retry_after
+    holds the seconds it asked us to wait when it said so.
+    """
+
+    def __init__(self, message, throttled=False, retry_after=None):
+        super().__init__(message)
+        self.throttled = throttled
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(value):
+    """seconds a Retry-After header asks to wait, None when it is missing
+    or unreadable"""
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+@functools.lru_cache(maxsize=None)
+def _start_tag_pattern(tag, class_name):
+    """pattern of a start tag whose class attribute holds the class"""
+    return re.compile(
+        rf"<(?i:{tag or '[a-z][a-z0-9]*'})(?=[\s/>])[^>]*?\sclass\s*=\s*[\"']?"
+        rf"(?:[^\"'>]*\s)?{re.escape(class_name)}(?=[\s\"'>])"
+    )
+
+
+def contains_selector(html_content, selector):
+    """check the html has at least one element matching the css selector
+
+    A tag and class selector is looked for in the start tags of the raw
+    html, parsing the whole page only for this check would cost as much as
+    parsing its listings. Other selectors are checked on the parsed page.
+    """
+    if not html_content:
+        return False
+    simple = SIMPLE_SELECTOR.match(selector)
+    if simple is not None:
+        return _start_tag_pattern(*simple.groups()).search(html_content) is not None
+    return make_soup(html_content).select_one(selector) is not None
+
+
+class HttpFetcher:
+    """async http client reusing compressed keep-alive connections"""
+
+    name = "http"
+
+    def __init__(
+        self,
+        max_connections=HTTP_MAX_CONNECTIONS,
+        timeout=HTTP_TIMEOUT,
+        page_cache=None,
+    ):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        # Conditional requests are sent for urls the cache has validators for
+        self.page_cache = page_cache
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """close the pooled connections"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            import aiohttp  # pylint: disable=import-outside-toplevel
+
+            self._session = aiohttp.ClientSession(
+                headers=HTTP_HEADERS,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    keepalive_timeout=60,
+                    ttl_dns_cache=300,
+                ),
+            )
+        return self._session
+
+    async def fetch(self, url, selector=None):  # pylint: disable=unused-argument
+        """download the page, None when the server refused it and
+        NOT_MODIFIED when it reports it unchanged
+
+        Connection errors, timeouts, throttling and server errors raise
+        FetchError, they may pass on a later attempt.
+        """
+        # aiohttp is imported on the first request, parsing saved pages never
+        # needs it
+        import aiohttp  # pylint: disable=import-outside-toplevel
+
+        headers = self.page_cache.conditional_headers(url) if self.page_cache else {}
+        try:
+            with tracer.span("http_get"):
+                return await self._get(url, headers)
+        except (aiohttp.ClientError, TimeoutError) as e:
+            raise FetchError(repr(e)) from e
+
+    def drop_validators(self, url):
+        """forget the etag and last-modified of a url, so the next run
+        fetches it in full"""
+        if self.page_cache is not None:
+            self.page_cache.stage(url, etag=None, last_modified=None)
+
+    async def _get(self, url, headers):
+        async with self._get_session().get(url, headers=headers) as response:
+            if response.status == 304:
+                return NOT_MODIFIED
+            if response.status in THROTTLED_STATUSES or response.status >= 500:
+                raise FetchError(
+                    f"HTTP {response.status}",
+                    throttled=response.status in THROTTLED_STATUSES,
+                    retry_after=retry_after_seconds(
+                        response.headers.get("Retry-After")
+                    ),
+                )
+            if response.status != 200:
+                print(f"Error fetching {url}: HTTP {response.status}")
+                return None
+            if self.page_cache is not None:
+                self.page_cache.stage(
+                    url,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+            # Bytes of the body as read, Content-Length is missing from
+            # chunked responses. text() decodes the body read here
+            body = await response.read()
+            tracer.count("bytes_fetched", len(body))
+            return await response.text()
+
+
+class BrowserFetcher:
+    """renders the page in a tab borrowed from the shared browser pool"""
+
+    name = "pyppeteer"
+
+    def __init__(
+        self, pool, wait_timeout=BROWSER_WAIT_TIMEOUT, policy=None, stats=None
+    ):
+        self.pool = pool
+        self.wait_timeout = wait_timeout
+        self.policy = policy
+        self.stats = stats
+
+    async def fetch(self, url, selector=None):
+        """render the page, waiting for the selector when one is given
+
+        Raises FetchError when the selector never showed up.
+        """
+        async with self.pool.page() as page:
+            if self.policy is not None:
+                await apply_policy(page, self.policy, self.stats)
+            with tracer.span("goto"):
+                await page.goto(url)
+            if selector:
+                # Wait for the necessary element to load
+                try:
+                    with tracer.span("wait_for_selector"):
+                        await page.waitForSelector(
+                            selector, timeout=self.wait_timeout
+                        )
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    await page.screenshot({"path": "error_screenshot.png"})
+                    raise FetchError(f"waiting for {selector}: {e}") from e
+            with tracer.span("page_content"):
+                html_content = await page.content()
+            tracer.count("bytes_fetched", len(html_content.encode("utf-8")))
+            return html_content
+
+
+class SeleniumFetcher:
+    """renders pages in one headless Firefox driven by selenium
+
+    The webdriver blocks and is not thread safe, so its calls run one at a
+    time in a worker thread. Firefox is only started by the first fetch.
+    """
+
+    name = "selenium"
+
+    def __init__(self, wait_timeout=BROWSER_WAIT_TIMEOUT / 1000):
+        self.wait_timeout = wait_timeout
+        self._driver = None
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """quit Firefox when it was started"""
+        if self._driver is not None:
+            driver, self._driver = self._driver, None
+            await run_blocking(driver.quit)
+
+    def _render(self, url, selector):
+        # pylint: disable=import-outside-toplevel,import-error
+        from selenium import webdriver
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        if self._driver is None:
+            options = webdriver.FirefoxOptions()
+            options.add_argument("-headless")
+            self._driver = webdriver.Firefox(options=options)
+        self._driver.get(url)
+        if selector:
+            # Wait until the properties are loaded
+            WebDriverWait(self._driver, self.wait_timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+            )
+        return self._driver.page_source
+
+    async def fetch(self, url, selector=None):
+        """render the page, raises FetchError when it failed or the selector
+        never showed"""
+        async with self._lock:
+            try:
+                with tracer.span("selenium_render"):
+                    html_content = await run_blocking(self._render, url, selector)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                raise FetchError(f"selenium: {e!r}") from e
+        tracer.count("bytes_fetched", len(html_content.encode("utf-8")))
+        return html_content
+
+
+class FallbackFetcher:
+    """tries the primary fetcher and only uses the fallback when the
+    expected selector is missing from the primary response"""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+
+    async def fetch(self, url, selector=None):
+        """fetch with the primary backend, fall back when it falls short
+
+        A FetchError of the primary is not a reason to fall back, the site
+        is down or throttling us and the browser would fare no better.
+        """
+        html_content = await self.primary.fetch(url, selector)
+        if html_content is NOT_MODIFIED:
+            return html_content
+        if selector is None or contains_selector(html_content, selector):
+            return html_content
+        print(
+            f"{selector} missing from {self.primary.name} response, "
+            f"retrying {url} with {self.fallback.name}"
+        )
+        # The validators describe the page without its listings, the server
+        # would report that shell unchanged while the rendered listings change
+        if hasattr(self.primary, "drop_validators"):
+            self.primary.drop_validators(url)
+        return await self.fallback.fetch(url, selector)
+
+
+def make_fetcher(
+    backend, pool, http_fetcher, policy=None, stats=None, selenium=None
+):
+    """build the fetcher for a backend name: http, pyppeteer or selenium,
+    the last one sharing the given SeleniumFetcher"""
+    browser_fetcher = BrowserFetcher(pool, policy=policy, stats=stats)
+    if backend == "http":
+        return FallbackFetcher(http_fetcher, browser_fetcher)
+    if backend == "pyppeteer":
+        return browser_fetcher
+    if backend == "selenium" and selenium is not None:
+        return selenium
+    raise ValueError(f"Unknown fetch backend: {backend}")
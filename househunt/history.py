@@ -0,0 +1,293 @@
+"""Append-only local history of every listing each run saw, to tell when a
+price changed or a listing went offline without reading the sheet
+
+Every run appends one small row per listing it saw: a listing id, the unix
+time and the price, size and energy label. Listings and the results pages
+each run read have their own tables, and observations and listings are
+indexed by listing and by time, so the queries below only read the rows of
+the window they ask about.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from househunt.seen_index import LOOKUP_CHUNK_SIZE, normalize_url
+
+HISTORY_PATH = os.environ.get("HISTORY_PATH", "listing_history.sqlite3")
+# Days every observation is kept, older ones are compacted to the changes
+HISTORY_RETENTION_DAYS = float(os.environ.get("HISTORY_RETENTION_DAYS", "30"))
+# Days a listing that went offline is kept at all
+HISTORY_MAX_AGE_DAYS = float(os.environ.get("HISTORY_MAX_AGE_DAYS", "365"))
+
+DAY = 24 * 60 * 60
+
+
+def _timestamp(moment):
+    """unix seconds of a datetime, a unix time or now when None"""
+    if moment is None:
+        return int(time.time())
+    if isinstance(moment, datetime):
+        return int(moment.timestamp())
+    return int(moment)
+
+
+def _datetime(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+class HistoryStore:
+    """sqlite database in WAL mode holding every observation of a listing
+
+    Rows are only ever appended by record. compact is the one place that
+    removes them: older runs are reduced to the observations where a
+    listing's price or label changed, plus each listing's last one.
+    """
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS listings ("
+                "id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, url TEXT NOT NULL, "
+                "source TEXT, address TEXT, last_seen INTEGER NOT NULL, page TEXT)"
+            )
+            columns = {
+                row[1] for row in self.connection.execute("PRAGMA table_info(listings)")
+            }
+            if "page" not in columns:
+                # Histories written before the page was kept
+                self.connection.execute("ALTER TABLE listings ADD COLUMN page TEXT")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS listings_last_seen ON listings (last_seen)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS observations ("
+                "listing INTEGER NOT NULL, observed_at INTEGER NOT NULL, "
+                "price INTEGER, size REAL, energy_label TEXT, "
+                "PRIMARY KEY (listing, observed_at)"
+                ") WITHOUT ROWID"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS observations_time "
+                "ON observations (observed_at)"
+            )
+            # When each results page was read, to tell a listing that went
+            # offline from one on a page that was skipped
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT NOT NULL, observed_at INTEGER NOT NULL, "
+                "PRIMARY KEY (url, observed_at)"
+                ") WITHOUT ROWID"
+            )
+
+    def __len__(self):
+        """number of observations stored"""
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM observations"
+        ).fetchone()[0]
+
+    def close(self):
+        """close the database connection"""
+        self.connection.close()
+
+    def record(self, listings_df, observed_at=None, pages=None, column="URL"):
+        """append an observation of every listing of a normalized batch,
+        returns how many were stored
+
+        pages maps the results pages that were read to the urls of the
+        listings they held, as kept by ListingBatch. Only listings whose
+        page was read again without them are ever reported gone.
+        """
+        observed_at = _timestamp(observed_at)
+        pages = pages or {}
+        page_of = {
+            normalize_url(url): page
+            for page, urls in pages.items()
+            for url in urls
+            if url
+        }
+        rows = {}
+        if not listings_df.empty:
+            # Plain python values, missing ones as None, as sqlite takes them
+            records = (
+                listings_df.astype(object).where(listings_df.notna(), None)
+            ).to_dict("records")
+            # One observation per listing, the last row wins
+            rows = {
+                normalize_url(row[column]): row for row in records if row.get(column)
+            }
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO listings (key, url, source, address, last_seen, page) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET url = excluded.url, "
+                "source = excluded.source, address = excluded.address, "
+                "last_seen = MAX(last_seen, excluded.last_seen), "
+                "page = COALESCE(excluded.page, page)",
+                (
+                    (
+                        key,
+                        row[column],
+                        row.get("source"),
+                        row.get("address"),
+                        observed_at,
+                        page_of.get(key),
+                    )
+                    for key, row in rows.items()
+                ),
+            )
+            ids = self._ids(rows)
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO observations "
+                "(listing, observed_at, price, size, energy_label) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        ids[key],
+                        observed_at,
+                        row.get("price_eur"),
+                        row.get("size_m2"),
+                        row.get("energy_label"),
+                    )
+                    for key, row in rows.items()
+                ),
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO pages (url, observed_at) VALUES (?, ?)",
+                ((page, observed_at) for page in pages),
+            )
+        return len(rows)
+
+    def _ids(self, keys):
+        ids = {}
+        keys = list(keys)
+        for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+            chunk = keys[start : start + LOOKUP_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            ids.update(
+                self.connection.execute(
+                    f"SELECT key, id FROM listings WHERE key IN ({placeholders})",
+                    chunk,
+                )
+            )
+        return ids
+
+    def price_changes(self, days=7, now=None):
+        """listings whose price changed in the last days, newest first, as
+        dicts with the url, source, address, old and new price and when"""
+        since = _timestamp(now) - int(days * DAY)
+        # Observations of the window by the time index, each compared with
+        # the one before it by the primary key
+        query = (
+            "SELECT url, source, address, previous, price, observed_at FROM ("
+            "  SELECT o.listing, o.observed_at, o.price, ("
+            "    SELECT p.price FROM observations p"
+            "    WHERE p.listing = o.listing AND p.observed_at < o.observed_at"
+            "    AND p.price IS NOT NULL"
+            "    ORDER BY p.observed_at DESC LIMIT 1"
+            "  ) AS previous"
+            "  FROM observations o"
+            "  WHERE o.observed_at >= ? AND o.price IS NOT NULL"
+            ") JOIN listings l ON l.id = listing "
+            "WHERE previous != price "
+            "ORDER BY observed_at DESC"
+        )
+        return [
+            {
+                "url": url,
+                "source": source,
+                "address": address,
+                "old_price": previous,
+                "new_price": price,
+                "changed_at": _datetime(observed_at),
+            }
+            for url, source, address, previous, price, observed_at in (
+                self.connection.execute(query, (since,))
+            )
+        ]
+
+    def gone_since(self, since):
+        """listings not seen since the given time although the results page
+        they were last seen on was read after it, as dicts with the url,
+        source, address, last price and when they were last seen
+
+        Pages a run skipped, being unchanged or after the first page of
+        listings seen before, say nothing about their listings.
+        """
+        since = _timestamp(since)
+        query = (
+            "SELECT l.url, l.source, l.address, o.price, l.last_seen "
+            "FROM listings l "
+            "JOIN observations o ON o.listing = l.id AND o.observed_at = l.last_seen "
+            "WHERE l.last_seen < ? AND EXISTS ("
+            "  SELECT 1 FROM pages"
+            "  WHERE pages.url = l.page AND pages.observed_at >= ?"
+            ") "
+            "ORDER BY l.last_seen DESC"
+        )
+        return [
+            {
+                "url": url,
+                "source": source,
+                "address": address,
+                "last_price": price,
+                "last_seen": _datetime(observed_at),
+            }
+            for url, source, address, price, observed_at in (
+                self.connection.execute(query, (since, since))
+            )
+        ]
+
+    def compact(
+        self,
+        retention_days=HISTORY_RETENTION_DAYS,
+        max_age_days=HISTORY_MAX_AGE_DAYS,
+        now=None,
+    ):
+        """bound the size of the database, returns the observations removed
+
+        Observations older than the retention are dropped unless the price
+        or label changed or it is a listing's last one, listings last seen
+        before the maximum age are dropped altogether, and the file is
+        checkpointed and vacuumed.
+        """
+        now = _timestamp(now)
+        cutoff = now - int(retention_days * DAY)
+        expired = now - int(max_age_days * DAY)
+        before = len(self)
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM observations WHERE (listing, observed_at) IN ("
+                "  SELECT listing, observed_at FROM ("
+                "    SELECT listing, observed_at, price, energy_label,"
+                "    LAG(price) OVER w AS previous_price,"
+                "    LAG(energy_label) OVER w AS previous_label,"
+                "    LEAD(observed_at) OVER w AS next_observed_at,"
+                "    ROW_NUMBER() OVER w AS number"
+                "    FROM observations"
+                "    WINDOW w AS (PARTITION BY listing ORDER BY observed_at)"
+                "  )"
+                "  WHERE observed_at < ? AND number > 1"
+                "  AND next_observed_at IS NOT NULL"
+                "  AND price IS previous_price AND energy_label IS previous_label"
+                ")",
+                (cutoff,),
+            )
+            self.connection.execute(
+                "DELETE FROM observations WHERE listing IN ("
+                "  SELECT id FROM listings WHERE last_seen < ?"
+                ")",
+                (expired,),
+            )
+            self.connection.execute(
+                "DELETE FROM listings WHERE last_seen < ?", (expired,)
+            )
+            self.connection.execute(
+                "DELETE FROM pages WHERE observed_at < ?", (cutoff,)
+            )
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.connection.execute("VACUUM")
+        return before - len(self)
@@ -0,0 +1,69 @@
+"""Typed listing record and a columnar batch that builds the DataFrame"""
+
+from dataclasses import dataclass, fields
+from typing import Optional
+
+
+@dataclass(slots=True)
+class Listing:
+    """a single property listed on one of the sites"""
+
+    source: str
+    url: str
+    address: str
+    price: str
+    size: Optional[str] = None
+    energy_label: Optional[str] = None
+    # Postcode, city and neighbourhood, "1094 AB Amsterdam (Oost)"
+    area: Optional[str] = None
+    timestamp: str = ""
+
+
+LISTING_FIELDS = tuple(field.name for field in fields(Listing))
+# Google Sheet column of each field, the url column predates the others
+SHEET_COLUMNS = {name: "URL" if name == "url" else name for name in LISTING_FIELDS}
+
+
+class ListingBatch:
+    """listings from any number of sites stored column by column
+
+    Listings are kept in a list per field, so building the DataFrame is a
+    single pass and listings from different sites can never overwrite each
+    other. pages maps every results page that was read to the urls of the
+    listings it held.
+    """
+
+    __slots__ = ("columns", "pages")
+
+    def __init__(self, listings=()):
+        self.columns = {name: [] for name in LISTING_FIELDS}
+        self.pages = {}
+        for listing in listings:
+            self.append(listing)
+
+    def __len__(self):
+        return len(self.columns["url"])
+
+    def __iter__(self):
+        for values in zip(*(self.columns[name] for name in LISTING_FIELDS)):
+            yield Listing(*values)
+
+    def append(self, listing):
+        """add a listing to the batch"""
+        for name in LISTING_FIELDS:
+            self.columns[name].append(getattr(listing, name))
+
+    def extend(self, other):
+        """add every listing and read page of another batch"""
+        for name in LISTING_FIELDS:
+            self.columns[name].extend(other.columns[name])
+        self.pages.update(other.pages)
+
+    def to_dataframe(self):
+        """DataFrame with one row per listing and the sheet column names"""
+        # pandas is slow to import and runs that only parse never need it
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+
+        return pd.DataFrame(
+            {SHEET_COLUMNS[name]: self.columns[name] for name in LISTING_FIELDS}
+        )
@@ -0,0 +1,262 @@
+"""Recognise the same property listed on several sites under different urls
+
+Listings are grouped by blocking keys, the normalized postcode plus house
+number and the city, street and house number, kept in an indexed table.
+Only listings sharing a key are compared, on their postcodes and on price
+and size within tolerances, so matching grows with the number of new
+listings rather than with the history.
+"""
+
+import os
+import re
+import unicodedata
+from househunt.seen_index import LOOKUP_CHUNK_SIZE, normalize_url
+
+# Relative price difference two listings of one property may have
+MATCH_PRICE_TOLERANCE = float(os.environ.get("MATCH_PRICE_TOLERANCE", "0.03"))
+# Square metres the sizes of two listings of one property may differ
+MATCH_SIZE_TOLERANCE = float(os.environ.get("MATCH_SIZE_TOLERANCE", "3"))
+
+POSTCODE_PATTERN = re.compile(r"\b(\d{4})\s?([a-z]{2})\b")
+# Street, house number and an optional addition such as 12-1, 12a, 12 h
+STREET_PATTERN = re.compile(
+    r"(?P<street>[a-z][a-z' .-]*?)\s*(?P<number>\d+)"
+    r"(?:\s*[-\s]?\s*(?P<addition>[a-z0-9]{1,4}))?\b"
+)
+# Words some sites put before the street, "Appartement Javastraat 12"
+PROPERTY_TYPES = (
+    "appartement",
+    "benedenwoning",
+    "bovenwoning",
+    "huis",
+    "maisonnette",
+    "penthouse",
+    "studio",
+    "woning",
+)
+
+
+def _plain(text):
+    """lower case ascii text without accents"""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return decomposed.encode("ascii", "ignore").decode("ascii").lower()
+
+
+def _area_text(area):
+    return _plain(area) if isinstance(area, str) else ""
+
+
+def postcode_of(address, area=None):
+    """normalized postcode of a listing, "1094ab", None when it shows none
+
+    The postcode is looked for in the area, the sites show it apart from
+    the street, or else in the address.
+    """
+    postcode = POSTCODE_PATTERN.search(_area_text(area))
+    if postcode is None:
+        postcode = POSTCODE_PATTERN.search(_plain(address))
+    return None if postcode is None else f"{postcode[1]}{postcode[2]}"
+
+
+def _city(area):
+    """city of an area without its postcode and neighbourhood, lower case"""
+    text = re.sub(r"\(.*?\)", " ", POSTCODE_PATTERN.sub(" ", _area_text(area)))
+    return re.sub(r"[^a-z]", "", text)
+
+
+def blocking_keys(address, area=None):
+    """keys an address is filed under, empty when it holds no house number
+
+    "Javastraat 12-1" in "1094 AB Amsterdam (Oost)" gives
+    "amsterdam|javastraat|12|1" and "1094ab|12|1". Streets of the same
+    name are in many towns, so without a city there is no street key.
+    """
+    text = _plain(address)
+    street = STREET_PATTERN.search(text)
+    if street is None:
+        return ()
+    name = re.sub(r"[^a-z]", "", street["street"])
+    for property_type in PROPERTY_TYPES:
+        if name.startswith(property_type) and len(name) > len(property_type):
+            name = name[len(property_type) :]
+            break
+    unit = f"{street['number']}|{street['addition'] or ''}"
+    keys = []
+    city = _city(area)
+    if city:
+        keys.append(f"{city}|{name}|{unit}")
+    postcode = postcode_of(address, area)
+    if postcode is not None:
+        keys.append(f"{postcode}|{unit}")
+    return tuple(keys)
+
+
+def _within(value, other, tolerance, relative):
+    """whether two values are close, None when either one is missing"""
+    if value is None or other is None:
+        return None
+    allowed = tolerance * max(value, other) if relative else tolerance
+    return abs(value - other) <= allowed
+
+
+def _number(value):
+    """float of a typed column value, None when it is missing"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number
+
+
+class PropertyMatcher:
+    """links listings of one property on different sites
+
+    Kept in the seen index database: every listing with its price, size,
+    postcode and the key of the property it belongs to, and the blocking
+    keys of every listing in an indexed table. Matches are staged by split and
+    only stored by commit, once the listings were registered.
+    """
+
+    def __init__(
+        self,
+        connection,
+        price_tolerance=MATCH_PRICE_TOLERANCE,
+        size_tolerance=MATCH_SIZE_TOLERANCE,
+    ):
+        self.connection = connection
+        self.price_tolerance = price_tolerance
+        self.size_tolerance = size_tolerance
+        self.pending = {}
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS properties ("
+                "key TEXT PRIMARY KEY, url TEXT NOT NULL, source TEXT, "
+                "price REAL, size REAL, property TEXT NOT NULL, postcode TEXT"
+                ") WITHOUT ROWID"
+            )
+            columns = {
+                row[1]
+                for row in self.connection.execute("PRAGMA table_info(properties)")
+            }
+            if "postcode" not in columns:
+                # Databases written before the postcode was kept
+                self.connection.execute(
+                    "ALTER TABLE properties ADD COLUMN postcode TEXT"
+                )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS property_blocks ("
+                "block TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (block, key)"
+                ") WITHOUT ROWID"
+            )
+
+    def _candidates(self, blocks):
+        """stored listings filed under any of the blocks, per block"""
+        blocks = list(blocks)
+        candidates = {}
+        for start in range(0, len(blocks), LOOKUP_CHUNK_SIZE):
+            chunk = blocks[start : start + LOOKUP_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            for block, *entry in self.connection.execute(
+                "SELECT b.block, p.key, p.url, p.source, p.price, p.size, "
+                "p.property, p.postcode "
+                "FROM property_blocks b JOIN properties p ON p.key = b.key "
+                f"WHERE b.block IN ({placeholders})",
+                chunk,
+            ):
+                candidates.setdefault(block, []).append(tuple(entry))
+        return candidates
+
+    def _matches(self, entry, candidate):
+        """whether two listings of different sites are the same property
+
+        Postcodes shown on both must be equal, and at least one of price
+        and size must be known on both and within its tolerance.
+        """
+        _, _, source, price, size, _, postcode = entry
+        _, _, other_source, other_price, other_size, _, other_postcode = candidate
+        if source == other_source:
+            return False
+        if postcode and other_postcode and postcode != other_postcode:
+            return False
+        checks = [
+            _within(price, other_price, self.price_tolerance, relative=True),
+            _within(size, other_size, self.size_tolerance, relative=False),
+        ]
+        compared = [check for check in checks if check is not None]
+        return bool(compared) and all(compared)
+
+    def split(self, listings_df, column="URL"):
+        """the listings of properties not seen before, and those of known
+        properties with the url they duplicate in a duplicate_of column
+
+        Listings of the same batch are matched against each other too.
+        """
+        rows = listings_df.to_dict("records")
+        row_blocks = [
+            blocking_keys(row.get("address") or "", row.get("area")) for row in rows
+        ]
+        candidates = self._candidates(
+            {block for blocks in row_blocks for block in blocks}
+        )
+
+        duplicate_of = []
+        for row, blocks in zip(rows, row_blocks):
+            key = normalize_url(row[column])
+            entry = (
+                key,
+                row[column],
+                str(row.get("source") or ""),
+                _number(row.get("price_eur")),
+                _number(row.get("size_m2")),
+                key,
+                postcode_of(row.get("address") or "", row.get("area")),
+            )
+            match = next(
+                (
+                    candidate
+                    for block in blocks
+                    for candidate in candidates.get(block, ())
+                    if candidate[0] != key and self._matches(entry, candidate)
+                ),
+                None,
+            )
+            if match is not None:
+                # Belongs to the property of the listing it matched
+                entry = entry[:5] + (match[5],) + entry[6:]
+            duplicate_of.append(None if match is None else match[1])
+            self.pending[key] = (entry, blocks)
+            for block in blocks:
+                candidates.setdefault(block, []).append(entry)
+
+        duplicates = listings_df.assign(duplicate_of=duplicate_of)
+        linked = duplicates["duplicate_of"].notna()
+        return listings_df[~linked.to_numpy()], duplicates[linked]
+
+    def commit(self, urls):
+        """store the staged listings of the given urls"""
+        keys = [normalize_url(url) for url in urls]
+        staged = [self.pending.pop(key) for key in keys if key in self.pending]
+        if not staged:
+            return
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO properties "
+                "(key, url, source, price, size, property, postcode) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (entry for entry, _ in staged),
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO property_blocks (block, key) VALUES (?, ?)",
+                ((block, entry[0]) for entry, blocks in staged for block in blocks),
+            )
+
+    def listings_of(self, url):
+        """urls of every listing of the property the url belongs to"""
+        return [
+            row[0]
+            for row in self.connection.execute(
+                "SELECT url FROM properties WHERE property = ("
+                "SELECT property FROM properties WHERE key = ?)",
+                (normalize_url(url),),
+            )
+        ]
@@ -0,0 +1,92 @@
+"""Turn the scraped text of a batch of listings into typed columns in one pass"""
+
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from househunt.seen_index import TRACKING_PARAMETERS
+
+# "€ 425.000 k.k.", "€ 1.250.000 v.o.n.", "€ 425,000": dots and commas
+# group the thousands
+PRICE_PATTERN = r"€\s*(?P<price>\d{1,3}(?:[.,]\d{3})+|\d+)"
+# "65 m²", "65,5 m2"
+SIZE_PATTERN = r"(?P<size>\d+(?:[.,]\d+)?)\s*m"
+# "A", "A+++", "label B", "C (voorlopig)"
+ENERGY_LABEL_PATTERN = r"(?<![\w/])(?P<label>[A-G]\+{0,4})(?![A-Za-z])"
+# Worst to best, so that label >= "C" means C or better
+ENERGY_LABELS = ("G", "F", "E", "D", "C", "B", "A", "A+", "A++", "A+++", "A++++")
+
+
+def canonical_url(url):
+    """the same listing url written one way
+
+    The scheme becomes https and the host lower case, empty path segments,
+    the fragment and tracking parameters are dropped and the remaining
+    query parameters are sorted. Unlike the seen index key it is still a
+    working link.
+    """
+    parts = urlsplit(str(url).strip())
+    path = "/" + "/".join(segment for segment in parts.path.split("/") if segment)
+    query = urlencode(
+        sorted(
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not name.startswith(TRACKING_PARAMETERS)
+        )
+    )
+    return urlunsplit(("https", (parts.hostname or "").lower(), path, query, ""))
+
+
+def normalize_listings(listings_df):
+    """copy of a listings DataFrame with typed columns
+
+    Adds price_eur (Int64), size_m2 and price_per_m2 (Float64), turns
+    source and energy_label into categoricals, energy labels ordered from
+    G to A++++, and rewrites URL to its canonical form. Text that cannot
+    be read becomes missing instead of raising.
+    """
+    # pandas is only imported by runs that build DataFrames
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    df = listings_df.copy()
+    if "URL" in df:
+        # Parsed once per distinct url, batches repeat urls across pages
+        urls = df["URL"].dropna().unique()
+        df["URL"] = df["URL"].map(dict(zip(urls, map(canonical_url, urls))))
+
+    if "price" in df:
+        price = df["price"].astype("string").str.extract(PRICE_PATTERN)["price"]
+        df["price_eur"] = pd.to_numeric(
+            price.str.replace(r"[.,]", "", regex=True), errors="coerce"
+        ).astype("Int64")
+    if "size" in df:
+        size = df["size"].astype("string").str.extract(SIZE_PATTERN)["size"]
+        df["size_m2"] = pd.to_numeric(
+            size.str.replace(",", ".", regex=False), errors="coerce"
+        ).astype("Float64")
+    if "price_eur" in df and "size_m2" in df:
+        size_m2 = df["size_m2"].where(df["size_m2"] > 0)
+        df["price_per_m2"] = (df["price_eur"] / size_m2).round(2).astype("Float64")
+
+    if "energy_label" in df:
+        label = (
+            df["energy_label"]
+            .astype("string")
+            .str.upper()
+            .str.extract(ENERGY_LABEL_PATTERN)["label"]
+        )
+        df["energy_label"] = pd.Categorical(
+            label, categories=ENERGY_LABELS, ordered=True
+        )
+    if "source" in df:
+        df["source"] = df["source"].astype("category")
+    return df
+
+
+def blank_missing(listings_df):
+    """plain python values with missing ones as empty strings, ready for
+    the sheet or an email
+
+    fillna("") cannot be used on typed columns, it is no valid number or
+    category.
+    """
+    values = listings_df.astype(object)
+    return values.where(listings_df.notna(), "")
+
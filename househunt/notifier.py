@@ -0,0 +1,199 @@
+"""Email notifications over one reused smtp connection, coalesced into digests"""
+
+import asyncio
+import os
+import smtplib
+from email.message import EmailMessage
+from househunt.offload import retry_call, run_blocking
+from househunt.tracing import tracer
+
+# Seconds new listings are collected before one digest email is sent
+EMAIL_DIGEST_WINDOW = float(os.environ.get("EMAIL_DIGEST_WINDOW", "60"))
+# Send every recipient their own message instead of one to all of them
+EMAIL_PERSONALIZE = os.environ.get("EMAIL_PERSONALIZE", "false").lower() == "true"
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.environ.get("SMTP_TIMEOUT", "30"))
+
+
+class SmtpConnection:
+    """one authenticated smtp connection, reopened when the server dropped it"""
+
+    def __init__(
+        self,
+        server,
+        port,
+        username=None,
+        password=None,
+        starttls=SMTP_STARTTLS,
+        timeout=SMTP_TIMEOUT,
+    ):
+        self.server = server
+        self.port = int(port) if port else 0
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._smtp = None
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        if self.starttls:
+            smtp.starttls()
+        if self.password:
+            smtp.login(self.username, self.password)
+        self._smtp = smtp
+
+    def send(self, message):
+        """send the message to its recipients, reconnecting once if needed"""
+        for attempt in range(2):
+            if self._smtp is None:
+                self._connect()
+            try:
+                self._smtp.send_message(message)
+                return
+            except smtplib.SMTPServerDisconnected:
+                # Idle connections get closed by the server, open a new one
+                self._smtp = None
+                if attempt:
+                    raise
+
+    def close(self):
+        """log out and close the connection"""
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except smtplib.SMTPException:
+            smtp.close()
+
+
+def is_temporary_smtp_error(error):
+    """the server asked to try again later"""
+    return isinstance(error, smtplib.SMTPResponseException) and (
+        400 <= error.smtp_code < 500
+    )
+
+
+def format_digest(listings, sheet_url):
+    """plain text body listing the new properties"""
+    lines = [f"Added {len(listings)} new listings to the Google Sheet.", ""]
+    for listing in listings:
+        details = ", ".join(
+            str(listing[key]) for key in ("address", "price") if listing.get(key)
+        )
+        if listing.get("matched_rule"):
+            details += f" ({listing['matched_rule']}, score {listing['score']:.1f})"
+        lines.append(f"- {details}: {listing.get('URL', '')}")
+    lines += ["", sheet_url]
+    return "\n".join(lines)
+
+
+class Notifier:
+    """emails new listings without blocking the event loop
+
+    Listings notified within digest_window seconds of each other go out as
+    one email. Sending happens in the shared sink threads over a connection
+    that stays open between emails, and is retried when the server answers
+    with a temporary 4xx error.
+    """
+
+    def __init__(
+        self,
+        connection,
+        sender,
+        recipients,
+        sheet_url="",
+        subject="New Property Listings Added",
+        digest_window=EMAIL_DIGEST_WINDOW,
+        personalize=EMAIL_PERSONALIZE,
+    ):
+        self.connection = connection
+        self.sender = sender
+        self.recipients = [recipient for recipient in recipients if recipient]
+        self.sheet_url = sheet_url
+        self.subject = subject
+        self.digest_window = digest_window
+        self.personalize = personalize
+        self.emails_sent = 0
+        self._pending = []
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+
+    def build_messages(self, listings):
+        """one message to every recipient, or one per recipient"""
+        body = format_digest(listings, self.sheet_url)
+        groups = (
+            [[recipient] for recipient in self.recipients]
+            if self.personalize
+            else [self.recipients]
+        )
+        messages = []
+        for group in groups:
+            message = EmailMessage()
+            message["From"] = self.sender
+            message["To"] = ", ".join(group)
+            message["Subject"] = self.subject
+            message.set_content(body)
+            messages.append(message)
+        return messages
+
+    async def notify(self, listings):
+        """queue listings (dicts with address, price and URL) for the next email"""
+        self._pending.extend(listings)
+        if self.digest_window <= 0:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.digest_window)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """send the queued listings now
+
+        When sending fails the listings are queued again for the next
+        email, they are in the seen index already and would never be
+        announced otherwise.
+        """
+        if not self._pending:
+            return
+        if not self.recipients:
+            print(
+                f"Warning: no EMAIL_RECIPIENTS set, {len(self._pending)} new "
+                "listings were not emailed."
+            )
+            self._pending = []
+            return
+        listings, self._pending = self._pending, []
+        async with self._lock:
+            try:
+                for message in self.build_messages(listings):
+                    with tracer.span("smtp_send"):
+                        await run_blocking(
+                            retry_call,
+                            self.connection.send,
+                            message,
+                            retry_if=is_temporary_smtp_error,
+                        )
+                    self.emails_sent += 1
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                self._pending = listings + self._pending
+                print(
+                    f"Error sending the email notification: {e!r}, "
+                    f"{len(self._pending)} listings stay queued."
+                )
+                return
+        print(f"Sent an email notification about {len(listings)} new listings.")
+
+    async def close(self):
+        """send what is still queued and close the connection"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        try:
+            await self.flush()
+        finally:
+            await run_blocking(self.connection.close)
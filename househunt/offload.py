@@ -0,0 +1,68 @@
+"""Run blocking sheet and smtp calls in worker threads, with timeouts and retries"""
+
+import asyncio
+import functools
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker threads shared by every blocking sink call
+SINK_THREADS = int(os.environ.get("SINK_THREADS", "4"))
+# Seconds an offloaded call may take before the caller gives up on it
+SINK_TIMEOUT = float(os.environ.get("SINK_TIMEOUT", "120"))
+# Attempts of a call failing with a transient error
+SINK_RETRIES = int(os.environ.get("SINK_RETRIES", "3"))
+# Seconds before the first retry, doubled on every further one
+SINK_BACKOFF = float(os.environ.get("SINK_BACKOFF", "2"))
+
+_executor = None
+
+
+def get_executor():
+    """the shared worker thread pool, created on first use"""
+    global _executor  # pylint: disable=global-statement
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=SINK_THREADS, thread_name_prefix="sink"
+        )
+    return _executor
+
+
+def retry_call(
+    func,
+    *args,
+    retry_if=None,
+    retries=SINK_RETRIES,
+    backoff=SINK_BACKOFF,
+    **kwargs,
+):
+    """call func, retrying with jittered exponential backoff while
+    retry_if(error) says the error is transient
+
+    Only for calls that are safe to repeat after that kind of error, this
+    runs in the worker thread so the sleeps never block the event loop.
+    """
+    for attempt in range(retries):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            if attempt == retries - 1 or (retry_if is not None and not retry_if(e)):
+                raise
+            delay = backoff * 2**attempt * random.uniform(0.5, 1.5)
+            name = getattr(func, "__name__", func)
+            print(f"{name} failed ({e!r}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+    return None
+
+
+async def run_blocking(func, *args, timeout=SINK_TIMEOUT, **kwargs):
+    """await a blocking call made in the worker thread pool
+
+    On timeout the caller moves on while the thread finishes the call, so
+    only the caller is unblocked, the call itself is not undone. A timeout
+    of None waits for the call however long it takes.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    return await asyncio.wait_for(loop.run_in_executor(get_executor(), call), timeout)
@@ -0,0 +1,85 @@
+"""Per-url cache of http validators and listing content hashes"""
+
+import hashlib
+import os
+import sqlite3
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+PAGE_CACHE_PATH = os.environ.get("PAGE_CACHE_PATH", "page_cache.sqlite3")
+CACHE_FIELDS = ("etag", "last_modified", "content_hash")
+
+
+def content_hash(soup):
+    """hash of the listing containers of a results page"""
+    return hashlib.sha1(str(soup).encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """remembers the etag, last-modified and listing hash of every results page
+
+    New values are staged while a run crawls and only committed once its
+    listings were registered, so a failed sheet write never makes the next
+    run skip a page whose listings were not stored.
+    """
+
+    def __init__(self, path=PAGE_CACHE_PATH):
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                "content_hash TEXT, updated_at TEXT NOT NULL)"
+            )
+        self.entries = {
+            row[0]: dict(zip(CACHE_FIELDS, row[1:]))
+            for row in self.connection.execute(
+                "SELECT url, etag, last_modified, content_hash FROM pages"
+            )
+        }
+        self.pending = {}
+
+    def close(self):
+        """close the database connection"""
+        self.connection.close()
+
+    def conditional_headers(self, url):
+        """request headers asking the server to skip an unchanged page"""
+        entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def unchanged(self, url, digest):
+        """whether the listing containers hash the same as last time"""
+        return self.entries.get(url, {}).get("content_hash") == digest
+
+    def stage(self, url, **fields):
+        """remember new values for a url until the next commit"""
+        self.pending.setdefault(url, {}).update(fields)
+
+    def commit(self, hosts=None):
+        """store the staged values, only those of the given hosts if any"""
+        urls = [
+            url
+            for url in self.pending
+            if hosts is None or urlsplit(url).hostname in hosts
+        ]
+        if not urls:
+            return
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        for url in urls:
+            self.entries.setdefault(url, {}).update(self.pending.pop(url))
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO pages "
+                "(url, etag, last_modified, content_hash, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (url, *(self.entries[url].get(name) for name in CACHE_FIELDS), now)
+                    for url in urls
+                ),
+            )
@@ -0,0 +1,39 @@
+"""How the results pages of a search link to each other"""
+
+from urllib.parse import urljoin
+from househunt.parsing import class_strainer, make_soup, token_strainer
+
+
+class PageNumbers:
+    """pages are numbered, the page links on the first page tell how many
+    there are so pages past the last one are never requested"""
+
+    def __init__(self, template, link_tag, link_class):
+        self.template = template
+        self.strainer = class_strainer(link_tag, link_class)
+
+    def page_url(self, url, page):
+        """url of a page of the search"""
+        return self.template.format(url=url.rstrip("/"), page=page)
+
+    def page_count(self, html_content):
+        """highest page number linked from a results page"""
+        soup = make_soup(html_content, self.strainer)
+        numbers = [
+            int(text)
+            for text in (link.get_text(strip=True) for link in soup.find_all(True))
+            if text.isdigit()
+        ]
+        return max(numbers, default=1)
+
+
+class NextLink:
+    """each results page links to the next one"""
+
+    def __init__(self, link_tag="a", rel="next"):
+        self.strainer = token_strainer(link_tag, "rel", rel)
+
+    def next_url(self, html_content, current_url):
+        """url of the page after this one, None on the last page"""
+        link = make_soup(html_content, self.strainer).find(href=True)
+        return urljoin(current_url, link["href"]) if link else None
@@ -0,0 +1,34 @@
+"""HTML parsing backend: lxml when installed, limited to the parts that are read"""
+
+import os
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401  pylint: disable=unused-import
+
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    DEFAULT_PARSER = "html.parser"
+
+# BeautifulSoup tree builder, lxml is several times faster than html.parser
+HTML_PARSER = os.environ.get("HTML_PARSER", DEFAULT_PARSER)
+
+
+def token_strainer(tag, attribute, token):
+    """only keep tag elements whose space separated attribute holds token,
+    with their descendants"""
+    # A pattern instead of a plain string, multi-valued attributes are
+    # matched as a whole while the document is being parsed
+    pattern = re.compile(rf"(^|\s){re.escape(token)}(\s|$)")
+    return SoupStrainer(tag, attrs={attribute: pattern})
+
+
+def class_strainer(tag, class_name):
+    """only keep tag elements carrying class_name, with their descendants"""
+    return token_strainer(tag, "class", class_name)
+
+
+def make_soup(html_content, strainer=None, parser=None):
+    """parse html, only building the parts matched by the strainer"""
+    return BeautifulSoup(html_content, parser or HTML_PARSER, parse_only=strainer)
@@ -0,0 +1,530 @@
+"""The scraping pipeline shared by every entry point: fetch, parse, dedup,
+store in the sheet and notify"""
+
+from datetime import datetime
+import functools
+import os
+import sys
+import asyncio
+from urllib.parse import urlsplit
+import pytz
+from househunt import config
+from househunt.blocking import BlockingStats, ResourcePolicy
+from househunt.browser_pool import BrowserPool
+from househunt.crawl import crawl
+from househunt.fetchers import HttpFetcher, SeleniumFetcher, make_fetcher
+from househunt.history import HistoryStore
+from househunt.listing import ListingBatch
+from househunt.matching import PropertyMatcher
+from househunt.normalize import blank_missing, normalize_listings
+from househunt.notifier import Notifier, SmtpConnection
+from househunt.offload import run_blocking
+from househunt.page_cache import PageCache
+from househunt.ratelimit import HostLimiter, RateLimitedFetcher
+from househunt.scheduler import Scheduler
+from househunt.searches import DEFAULT_SEARCHES, load_searches
+from househunt.seen_index import SeenIndex
+from househunt.sheet_backends import open_sheet
+from househunt.sheet_sync import SheetSync
+from househunt.sites import SITES, extract_listings
+from househunt.stream import SearchStream
+from househunt.tracing import RUN_SITE, current_site, start_metrics_server, tracer
+
+# Set the timezone to 'Europe/Amsterdam'
+AMSTERDAM_TIMEZONE = pytz.timezone("Europe/Amsterdam")
+
+
+# The sheet and the smtp connection are opened on first use, dry runs and
+# parse-only runs never open them
+@functools.cache
+def get_sheet_sync():
+    """open the sheet, new listings are appended below its rows"""
+    import gspread  # pylint: disable=import-outside-toplevel
+
+    # Attempt to access the specified spreadsheet and sheet, SHEET_BACKEND
+    # may swap in a local stand-in
+    try:
+        sheet = open_sheet(
+            config.SPREADSHEET_ID, config.SHEET_NAME, config.SERVICE_ACCOUNT_FILE
+        )
+    except gspread.SpreadsheetNotFound:
+        print("Error: Spreadsheet not found. Please check the SPREADSHEET_ID.")
+        sys.exit()
+    except gspread.WorksheetNotFound:
+        print("Error: Worksheet not found. Please check the SHEET_NAME.")
+        sys.exit()
+    return SheetSync(sheet)
+
+
+@functools.cache
+def get_notifier():
+    """emails reuse one smtp connection and bundle listings found close together"""
+    return Notifier(
+        SmtpConnection(
+            config.SMTP_SERVER,
+            config.SMTP_PORT,
+            config.EMAIL_USERNAME,
+            config.EMAIL_PASSWORD,
+        ),
+        config.EMAIL_USERNAME,
+        config.email_recipients(),
+        sheet_url=config.SHEET_URL,
+    )
+
+
+@functools.cache
+def get_rules():
+    """rules deciding which new listings are emailed, read from rules.json"""
+    # numpy is only imported once there are listings to check
+    from househunt.rules import load_rules  # pylint: disable=import-outside-toplevel
+
+    return load_rules()
+
+
+def check_rules():
+    """read the notification rules before anything is crawled, a broken
+    rules file ends the run before a listing is registered without its
+    email"""
+    try:
+        get_rules()
+    except (OSError, ValueError) as e:
+        print(f"Error: the notification rules could not be read: {e}")
+        sys.exit(1)
+
+
+async def close_notifier():
+    """send the queued emails, when anything was ever queued"""
+    if get_notifier.cache_info().currsize:
+        await get_notifier().close()
+
+
+# The local databases are opened on first use too, parse-only runs and
+# history queries never create the ones they do not read
+@functools.cache
+def get_seen_index():
+    """local index of the urls already registered, duplicates are checked
+    against it"""
+    return SeenIndex()
+
+
+@functools.cache
+def get_property_matcher():
+    """links listings of properties already registered from another site
+    to them instead of adding them again"""
+    return PropertyMatcher(get_seen_index().connection)
+
+
+@functools.cache
+def get_page_cache():
+    """validators and listing hashes of every results page crawled before"""
+    return PageCache()
+
+
+@functools.cache
+def get_history():
+    """every listing each run saw, to follow prices and listings going
+    offline"""
+    return HistoryStore()
+
+
+# Searches to watch, read from searches.json when it exists
+SEARCHES = load_searches(default=DEFAULT_SEARCHES)
+
+
+def select_searches(sites=None):
+    """the searches of the given sites, all of them when None"""
+    return [search for search in SEARCHES if sites is None or search.site in sites]
+
+
+# Fetch backend per site, http falls back to the browser when the listings
+# are missing from the plain response
+SITE_FETCHERS = {
+    "pararius": os.environ.get("PARARIUS_FETCHER", "http"),
+    "vbo": os.environ.get("VBO_FETCHER", "http"),
+    "huislijn": os.environ.get("HUISLIJN_FETCHER", "pyppeteer"),
+}
+
+
+# Assets each site may load when rendered in the browser
+SITE_POLICIES = {site: ResourcePolicy.from_env(site) for site in SITE_FETCHERS}
+
+
+def build_fetchers(pool, http_fetcher, blocking_stats, backend=None, selenium=None):
+    """pick the fetch backend for every site, the configured one unless a
+    backend is given, all searches on a host share that host's rate limit"""
+    limiter = HostLimiter()
+    return {
+        site: RateLimitedFetcher(
+            make_fetcher(
+                backend or site_backend,
+                pool,
+                http_fetcher,
+                policy=SITE_POLICIES[site],
+                stats=blocking_stats[site],
+                selenium=selenium,
+            ),
+            limiter,
+        )
+        for site, site_backend in SITE_FETCHERS.items()
+    }
+
+
+def report_blocking(blocking_stats):
+    """print and reset the blocked request counts of the sites that used the browser"""
+    for site, stats in blocking_stats.items():
+        if stats.requests_allowed or stats.requests_blocked:
+            print(f"{site}: {stats.summary()}")
+        stats.reset()
+
+
+async def scrape(search, fetcher):
+    """asyn function to crawl the results pages of a search into a batch"""
+    # Spans and counters of the crawl are filed under the search's site
+    current_site.set(search.site)
+    return await crawl(
+        SITES[search.site],
+        search.url,
+        fetcher,
+        current_timestamp(),
+        # Later pages only hold older listings once a page was all seen
+        all_seen=get_seen_index().contains_all,
+        max_pages=search.max_pages,
+        page_cache=get_page_cache(),
+    )
+
+
+def listings_frame(batch):
+    """DataFrame of a batch with prices, sizes and labels as typed columns"""
+    with tracer.span("normalize"):
+        return normalize_listings(batch.to_dataframe())
+
+
+async def stream_searches(
+    searches, fetchers, sheet_lock, dry_run=False, history_lock=None
+):
+    """crawl the searches concurrently and register the listings of each
+    one as soon as its crawl finished, returns the hosts whose searches
+    were all registered
+
+    history_lock is held while a batch is recorded in the listing history,
+    the daemon holds it while compacting the history.
+    """
+    history_lock = history_lock or asyncio.Lock()
+    registered, incomplete = set(), set()
+    async with SearchStream(
+        searches, lambda search: scrape(search, fetchers[search.site])
+    ) as stream:
+        async for search, batch in stream:
+            # Normalizing, dedup and the sheet write are filed under the
+            # search's site too, not only its crawl
+            current_site.set(search.site)
+            host = urlsplit(search.url).hostname
+            if batch is None:
+                print(f"Error: could not fetch the {search.name} search.")
+                incomplete.add(host)
+                continue
+            if dry_run:
+                preview_new_listings(listings_frame(batch))
+            elif batch or batch.pages:
+                listings_df = listings_frame(batch)
+                # Pages read without listings still tell which ones are gone
+                async with history_lock:
+                    with tracer.span("history"):
+                        get_history().record(listings_df, pages=batch.pages)
+                if batch:
+                    # Only one search at a time may write to the sheet
+                    async with sheet_lock:
+                        await register_new_listings(listings_df)
+            registered.add(host)
+    for search in stream.unfinished:
+        print(f"Error: the {search.name} search did not finish before the deadline.")
+        incomplete.add(urlsplit(search.url).hostname)
+    return registered - incomplete
+
+
+def current_timestamp():
+    """format the current Amsterdam time as a timestamp"""
+    return datetime.now(AMSTERDAM_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")
+
+
+async def reconcile_seen_index():
+    """rebuild the local index of seen listings from the urls in the sheet"""
+    with tracer.span("sheet_read"):
+        # The sheet is opened in the worker thread too, authorizing and
+        # opening it are network calls
+        urls = await run_blocking(lambda: get_sheet_sync().urls())
+    seen_index = get_seen_index()
+    added, removed = seen_index.reconcile(urls)
+    print(
+        f"Seen listings index rebuilt from the Google Sheet: {len(seen_index)} "
+        f"listings ({added} added, {removed} removed)."
+    )
+
+
+async def register_new_listings(new_listings_df):
+    """append unseen listings to the sheet, notify and return them"""
+    with tracer.span("dedup"):
+        new_listings = get_seen_index().filter_new(new_listings_df)
+        new_listings, duplicates = get_property_matcher().split(new_listings)
+    tracer.count("new_listings", len(new_listings))
+    tracer.count("linked_listings", len(duplicates))
+
+    if not duplicates.empty:
+        # Nothing to write or email, the property is in the sheet already
+        get_seen_index().add(duplicates["URL"])
+        get_property_matcher().commit(duplicates["URL"])
+        for listing in duplicates.to_dict("records"):
+            print(f"{listing['URL']} is the same property as {listing['duplicate_of']}")
+        print(
+            f"Linked {len(duplicates)} new listings to properties already "
+            "in the Google Sheet."
+        )
+
+    if new_listings.empty:
+        print("No new listings found.")
+        return new_listings
+
+    # The index only learns about listings the sheet accepted, a failed
+    # batch is retried on the next run. Every request runs in a worker
+    # thread so other sites keep scraping meanwhile
+    with tracer.span("sheet_append"):
+        sheet_sync = await run_blocking(get_sheet_sync)
+        batches = await run_blocking(sheet_sync.row_batches, new_listings)
+        for index, (rows, urls) in enumerate(batches):
+            if index:
+                await asyncio.sleep(sheet_sync.batch_pause)
+            # No caller timeout: an append given up on could still land
+            # and be appended again, SHEET_TIMEOUT ends a hung request
+            await run_blocking(sheet_sync.append_batch, rows, urls, timeout=None)
+            get_seen_index().add(urls)
+            get_property_matcher().commit(urls)
+
+    print(f"Added {len(new_listings)} new listings to the Google Sheet.")
+    # Every new listing is stored, only those matching a rule are emailed
+    with tracer.span("rules"):
+        notable = get_rules().apply(new_listings)
+    tracer.count("notable_listings", len(notable))
+    if len(notable) < len(new_listings):
+        print(f"{len(notable)} of them match the notification rules.")
+    if not notable.empty:
+        await get_notifier().notify(blank_missing(notable).to_dict("records"))
+    return new_listings
+
+
+async def run_once(sites=None, backend=None, dry_run=False):
+    """scrape the sites, combine results, register and send notification
+
+    A dry run only prints the listings that would be registered, without
+    opening the sheet or sending email.
+    """
+    check_rules()
+    if get_seen_index().reconciled_at is None:
+        if dry_run:
+            print("The seen listings index was never built, all listings are new.")
+        else:
+            await reconcile_seen_index()
+
+    # Scrape websites concurrently, sharing one browser and one http pool
+    blocking_stats = {site: BlockingStats() for site in SITE_FETCHERS}
+    http_fetcher = HttpFetcher(page_cache=get_page_cache())
+    try:
+        async with BrowserPool() as pool, http_fetcher, SeleniumFetcher() as selenium:
+            fetchers = build_fetchers(
+                pool, http_fetcher, blocking_stats, backend, selenium
+            )
+            # Listings are registered and emailed search by search, the
+            # first email never waits for the slowest site
+            hosts = await stream_searches(
+                select_searches(sites), fetchers, asyncio.Lock(), dry_run
+            )
+        report_blocking(blocking_stats)
+        # Only now the listings are stored, unchanged pages may be skipped
+        if not dry_run:
+            get_page_cache().commit(hosts)
+    finally:
+        await close_notifier()
+        write_run_report()
+
+
+def preview_new_listings(new_listings_df):
+    """print the unseen listings without storing them anywhere"""
+    new_listings = get_seen_index().filter_new(new_listings_df)
+    new_listings, duplicates = get_property_matcher().split(new_listings)
+    for listing in duplicates.to_dict("records"):
+        print(f"{listing['URL']} is the same property as {listing['duplicate_of']}")
+    notable = get_rules().apply(new_listings)
+    for listing in blank_missing(notable).to_dict("records"):
+        print(
+            f"{listing['source']}: {listing['address']}, {listing['price']}, "
+            f"{listing['URL']} (score {listing['score']:.1f})"
+        )
+    if len(notable) < len(new_listings):
+        print(f"{len(new_listings) - len(notable)} more do not match the rules.")
+    print(
+        f"Dry run: {len(new_listings)} new listings would be added to the Google Sheet."
+    )
+
+
+def parse_only(pages):
+    """print the listings of saved results pages, given as site=path"""
+    for page in pages:
+        site, path = page.split("=", 1)
+        batch = ListingBatch()
+        with open(path, encoding="utf-8") as html_file:
+            extract_listings(SITES[site], html_file.read(), batch, current_timestamp())
+        for listing in batch:
+            print(f"{site}: {listing.address}, {listing.price}, {listing.url}")
+        print(f"{path}: {len(batch)} listings")
+
+
+def print_price_changes(days):
+    """print the listings whose price changed in the last days"""
+    changes = get_history().price_changes(days)
+    for change in changes:
+        changed_at = change["changed_at"].astimezone(AMSTERDAM_TIMEZONE)
+        print(
+            f"{changed_at:%Y-%m-%d %H:%M} {change['source']}: {change['address']}, "
+            f"€ {change['old_price']} -> € {change['new_price']}, {change['url']}"
+        )
+    print(f"{len(changes)} price changes in the last {days:g} days.")
+
+
+def print_gone_since(since):
+    """print the listings not seen anymore since a date or time, read as
+    Amsterdam time"""
+    if since.tzinfo is None:
+        since = AMSTERDAM_TIMEZONE.localize(since)
+    gone = get_history().gone_since(since)
+    for listing in gone:
+        last_seen = listing["last_seen"].astimezone(AMSTERDAM_TIMEZONE)
+        print(
+            f"{last_seen:%Y-%m-%d %H:%M} {listing['source']}: {listing['address']}, "
+            f"€ {listing['last_price']}, {listing['url']}"
+        )
+    print(f"{len(gone)} listings gone since {since:%Y-%m-%d %H:%M}.")
+
+
+def print_same_property(url):
+    """print every listing linked to the property of a url"""
+    urls = get_property_matcher().listings_of(url)
+    for listing_url in urls:
+        print(listing_url)
+    print(f"{len(urls)} listings of the property of {url}.")
+
+
+def compact_history():
+    """shrink the listing history to its changes and drop expired listings"""
+    with tracer.span("history_compact"):
+        removed = get_history().compact()
+    print(f"Listing history compacted: {removed} observations removed.")
+
+
+def compact_history_file(path):
+    """compact the history database at path with a connection of its own,
+    sqlite connections stay in the thread that opened them"""
+    history = HistoryStore(path)
+    try:
+        return history.compact()
+    finally:
+        history.close()
+
+
+async def compact_history_offloaded():
+    """compact the listing history in a worker thread, the event loop keeps
+    scraping meanwhile"""
+    path = get_history().path
+    with tracer.span("history_compact"):
+        # No caller timeout, the compaction would go on without the lock
+        removed = await run_blocking(compact_history_file, path, timeout=None)
+    print(f"Listing history compacted: {removed} observations removed.")
+
+
+def write_run_report(site=None):
+    """append the timings and counters of the run to the run log and print
+    where the time went"""
+    record = tracer.write_run_log(site)
+    stages = ", ".join(
+        f"{stage} {seconds:.2f}s" for stage, seconds in record["stages"].items()
+    )
+    print(f"Run report: {stages or 'nothing traced'}")
+
+
+# Poll interval per site in seconds when running as a daemon
+SITE_INTERVALS = {
+    "pararius": int(os.environ.get("PARARIUS_INTERVAL", "120")),
+    "vbo": int(os.environ.get("VBO_INTERVAL", "120")),
+    "huislijn": int(os.environ.get("HUISLIJN_INTERVAL", "180")),
+}
+# Fraction of the interval each poll is randomly shifted by
+POLL_JITTER = float(os.environ.get("POLL_JITTER", "0.2"))
+# Seconds between compactions of the listing history in daemon mode
+HISTORY_COMPACT_INTERVAL = float(os.environ.get("HISTORY_COMPACT_INTERVAL", "86400"))
+# Port of the Prometheus metrics endpoint in daemon mode, off when unset
+METRICS_PORT = os.environ.get("METRICS_PORT")
+# Address the metrics endpoint listens on, 0.0.0.0 serves every interface
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+
+
+async def run_daemon(sites=None, backend=None):
+    """keep the browser and listings warm and poll each site on its own interval"""
+    check_rules()
+    if get_seen_index().reconciled_at is None:
+        await reconcile_seen_index()
+        # The sheet read belongs to no site's run
+        write_run_report(RUN_SITE)
+    sheet_lock = asyncio.Lock()
+    history_lock = asyncio.Lock()
+
+    if METRICS_PORT:
+        await start_metrics_server(int(METRICS_PORT), METRICS_HOST)
+        print(f"Serving Prometheus metrics on {METRICS_HOST}:{METRICS_PORT}.")
+
+    blocking_stats = {site: BlockingStats() for site in SITE_FETCHERS}
+
+    def make_job(site, site_searches, fetchers):
+        async def job():
+            current_site.set(site)
+            try:
+                hosts = await stream_searches(
+                    site_searches, fetchers, sheet_lock, history_lock=history_lock
+                )
+                report_blocking({site: blocking_stats[site]})
+                get_page_cache().commit(hosts)
+            finally:
+                write_run_report(site)
+
+        return job
+
+    http_fetcher = HttpFetcher(page_cache=get_page_cache())
+    async with BrowserPool() as pool, http_fetcher, SeleniumFetcher() as selenium:
+        fetchers = build_fetchers(
+            pool, http_fetcher, blocking_stats, backend, selenium
+        )
+        scheduler = Scheduler()
+        for site in SITE_INTERVALS:
+            site_searches = [
+                search for search in select_searches(sites) if search.site == site
+            ]
+            if not site_searches:
+                continue
+            scheduler.every(
+                SITE_INTERVALS[site],
+                make_job(site, site_searches, fetchers),
+                name=site,
+                jitter=POLL_JITTER,
+            )
+
+        async def compact_job():
+            # Batches are recorded once the compaction finished
+            async with history_lock:
+                try:
+                    await compact_history_offloaded()
+                finally:
+                    write_run_report(RUN_SITE)
+
+        scheduler.every(HISTORY_COMPACT_INTERVAL, compact_job, name="history")
+        try:
+            await scheduler.run()
+        finally:
+            await close_notifier()
+
@@ -0,0 +1,249 @@
+"""Per-host rate limiting, retries and circuit breakers shared by every
+search hitting the same site
+
+Every host has a token bucket refilled at its request rate. The rate is
+halved whenever the host throttles us and grows back with every fetch that
+succeeds. Failed fetches are retried with jittered exponential backoff
+outside the host's slots, and a host failing over and over is skipped for
+a while, so a slow or throttling site never holds up the others.
+"""
+
+import asyncio
+import os
+import random
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from househunt.fetchers import FetchError
+from househunt.tracing import tracer
+
+# Requests in flight per host
+HOST_CONCURRENCY = int(os.environ.get("HOST_CONCURRENCY", "2"))
+# Seconds between the start of two requests to the same host
+HOST_MIN_INTERVAL = float(os.environ.get("HOST_MIN_INTERVAL", "1"))
+# Requests that may start at once after a host was quiet for a while
+HOST_BURST = float(os.environ.get("HOST_BURST", "1"))
+# Longest interval throttling may slow a host down to, in seconds
+HOST_MAX_INTERVAL = float(os.environ.get("HOST_MAX_INTERVAL", "30"))
+# Attempts of a fetch failing with a transient error
+FETCH_RETRIES = int(os.environ.get("FETCH_RETRIES", "3"))
+# Seconds before the first retry, doubled on every further one
+FETCH_BACKOFF = float(os.environ.get("FETCH_BACKOFF", "2"))
+# Failed attempts in a row after which a host is skipped
+BREAKER_THRESHOLD = int(os.environ.get("BREAKER_THRESHOLD", "5"))
+# Seconds a host is skipped before one fetch may try it again
+BREAKER_COOLDOWN = float(os.environ.get("BREAKER_COOLDOWN", "300"))
+
+
+def host_of(url):
+    """the host a url is rate limited under"""
+    return urlsplit(url).hostname or ""
+
+
+class TokenBucket:
+    """tokens refilled at an adjustable rate, one taken per request
+
+    The rate stays between 1 / max_interval and 1 / min_interval requests
+    per second. Waiters are served one at a time, in arrival order.
+    """
+
+    def __init__(self, min_interval, max_interval, burst):
+        self.max_rate = 1 / min_interval if min_interval > 0 else float("inf")
+        self.min_rate = min(1 / max_interval, self.max_rate)
+        self.rate = self.max_rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = None
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        if self.rate == float("inf"):
+            self.tokens = self.burst
+        elif self.updated is not None:
+            elapsed = now - self.updated
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    async def take(self):
+        """wait for a token"""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                self._refill(now)
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def slow_down(self, retry_after=None):
+        """halve the rate, and pause for retry_after seconds when given"""
+        # An unlimited host is slowed down from one request per second
+        rate = 1.0 if self.rate == float("inf") else self.rate
+        self.rate = max(self.min_rate, rate / 2)
+        self.tokens = min(self.tokens, 0)
+        if retry_after:
+            loop = asyncio.get_running_loop()
+            self.paused_until = max(self.paused_until, loop.time() + retry_after)
+
+    def speed_up(self):
+        """win back a tenth of the full rate"""
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class CircuitBreaker:
+    """opens after threshold failed attempts in a row, then lets a single
+    trial through once the cooldown passed"""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def allow(self, now):
+        """whether a fetch may be tried"""
+        if self.opened_at is None:
+            return True
+        if now - self.opened_at < self.cooldown or self.trial:
+            return False
+        # Half open: this fetch decides whether the host is back
+        self.trial = True
+        return True
+
+    def release_trial(self):
+        """give up a trial that never finished, the next fetch tries again"""
+        self.trial = False
+
+    def succeeded(self):
+        """close the breaker"""
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def failed(self, now):
+        """count a failed attempt, returns whether the breaker just opened"""
+        self.failures += 1
+        was_open = self.opened_at is not None
+        if self.trial or self.failures >= self.threshold:
+            self.opened_at = now
+            self.trial = False
+            return not was_open
+        return False
+
+
+class HostLimiter:
+    """caps concurrent requests, paces request starts and tracks failures
+    per host"""
+
+    def __init__(
+        self,
+        concurrency=HOST_CONCURRENCY,
+        min_interval=HOST_MIN_INTERVAL,
+        max_interval=HOST_MAX_INTERVAL,
+        burst=HOST_BURST,
+        breaker_threshold=BREAKER_THRESHOLD,
+        breaker_cooldown=BREAKER_COOLDOWN,
+    ):
+        self.min_interval = min_interval
+        self._semaphores = defaultdict(lambda: asyncio.Semaphore(concurrency))
+        self.buckets = defaultdict(
+            lambda: TokenBucket(min_interval, max_interval, burst)
+        )
+        self.breakers = defaultdict(
+            lambda: CircuitBreaker(breaker_threshold, breaker_cooldown)
+        )
+
+    @asynccontextmanager
+    async def slot(self, url):
+        """wait for a free slot and a token on the url's host"""
+        host = host_of(url)
+        async with self._semaphores[host]:
+            await self.buckets[host].take()
+            yield
+
+    def allow(self, url):
+        """whether the url's host is not being skipped"""
+        return self.breakers[host_of(url)].allow(asyncio.get_running_loop().time())
+
+    def succeeded(self, url):
+        """record a fetch the host answered, speeding it up again"""
+        host = host_of(url)
+        self.breakers[host].succeeded()
+        self.buckets[host].speed_up()
+
+    def failed(self, url, error):
+        """record a failed attempt, slowing the host down when it throttled"""
+        host = host_of(url)
+        if isinstance(error, FetchError) and error.throttled:
+            self.buckets[host].slow_down(error.retry_after)
+            tracer.count("fetch_throttled")
+        if self.breakers[host].failed(asyncio.get_running_loop().time()):
+            tracer.count("breaker_opened")
+            print(
+                f"Error: {host} failed {self.breakers[host].failures} times in a "
+                f"row, skipping it for {self.breakers[host].cooldown:.0f}s."
+            )
+
+
+class RateLimitedFetcher:
+    """fetcher that waits for its host's limiter before every request and
+    retries transient failures
+
+    Any error of the wrapped fetcher, a FetchError or whatever a browser
+    raises, counts as transient. After the last attempt the fetch returns
+    None like any failed fetch, so one failing site never ends the run.
+    """
+
+    def __init__(self, fetcher, limiter, retries=FETCH_RETRIES, backoff=FETCH_BACKOFF):
+        self.fetcher = fetcher
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+        self.name = fetcher.name
+
+    async def fetch(self, url, selector=None):
+        """fetch the url once its host has a free slot, None when every
+        attempt failed or the host is being skipped"""
+        for attempt in range(self.retries):
+            if not self.limiter.allow(url):
+                tracer.count("fetch_skipped")
+                print(f"Error: skipping {url}, {host_of(url)} keeps failing.")
+                return None
+            breaker = self.limiter.breakers[host_of(url)]
+            # Allowed while the breaker is open, this fetch is its trial
+            trial = breaker.trial
+            try:
+                async with self.limiter.slot(url):
+                    html_content = await self.fetcher.fetch(url, selector)
+            except asyncio.CancelledError:
+                # A cancelled trial said nothing about the host, without
+                # releasing it the host would be skipped for good
+                if trial:
+                    breaker.release_trial()
+                raise
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                self.limiter.failed(url, e)
+                reason = str(e) if isinstance(e, FetchError) else repr(e)
+                if attempt == self.retries - 1:
+                    tracer.count("fetch_failed")
+                    print(f"Error fetching {url}: {reason}, giving up.")
+                    return None
+                # The backoff is slept outside the host's slots, other
+                # searches on the host go on meanwhile
+                delay = self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+                if isinstance(e, FetchError) and e.retry_after:
+                    delay = max(delay, e.retry_after)
+                tracer.count("fetch_retries")
+                print(f"Error fetching {url}: {reason}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            self.limiter.succeeded(url)
+            return html_content
+        return None
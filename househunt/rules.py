@@ -0,0 +1,249 @@
+"""Rules deciding which new listings are worth an email, and how they rank
+
+Every rule is a set of conditions that must all hold. A listing is
+announced when it matches any rule, and listings are ordered by a weighted
+score. The thresholds of all rules are stacked into arrays, so a batch is
+checked against every rule at once instead of listing by listing.
+"""
+
+import json
+import os
+import re
+import numpy as np
+from househunt.normalize import ENERGY_LABELS
+
+RULES_PATH = os.environ.get("RULES_PATH", "rules.json")
+
+# Numeric conditions: rule option, normalized column, and whether the
+# value must be at most (True) or at least (False) the threshold
+THRESHOLDS = (
+    ("max_price", "price_eur", True),
+    ("max_price_per_m2", "price_per_m2", True),
+    ("min_size", "size_m2", False),
+)
+# Every option a rule of rules.json may set
+RULE_OPTIONS = (
+    "name",
+    *(option for option, _, _ in THRESHOLDS),
+    "min_energy_label",
+    "include_areas",
+    "exclude_areas",
+    "sites",
+)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Rule:
+    """conditions a listing must all meet, unset ones always hold
+
+    Listings whose price, size or label could not be read are not held
+    against a threshold on it, a listing is never hidden for missing text.
+    Areas are matched case insensitively anywhere in the address or the
+    area, which holds the postcode, city and neighbourhood.
+    """
+
+    def __init__(
+        self,
+        name,
+        max_price=None,
+        max_price_per_m2=None,
+        min_size=None,
+        min_energy_label=None,
+        include_areas=(),
+        exclude_areas=(),
+        sites=(),
+    ):
+        self.name = name
+        thresholds = {
+            "max_price": max_price,
+            "max_price_per_m2": max_price_per_m2,
+            "min_size": min_size,
+        }
+        for option, value in thresholds.items():
+            if value is not None and not _is_number(value):
+                raise ValueError(f"{option} of rule {name} is no number: {value!r}")
+        lists = {
+            "include_areas": include_areas,
+            "exclude_areas": exclude_areas,
+            "sites": sites,
+        }
+        for option, value in lists.items():
+            if isinstance(value, str):
+                raise ValueError(f"{option} of rule {name} must be a list: {value!r}")
+        self.max_price = max_price
+        self.max_price_per_m2 = max_price_per_m2
+        self.min_size = min_size
+        if min_energy_label is not None and min_energy_label not in ENERGY_LABELS:
+            raise ValueError(
+                f"Unknown energy label in rule {name}: {min_energy_label}"
+            )
+        self.min_energy_label = min_energy_label
+        self.include_areas = tuple(include_areas)
+        self.exclude_areas = tuple(exclude_areas)
+        self.sites = tuple(sites)
+
+    def __repr__(self):
+        return f"Rule({self.name!r})"
+
+
+def _threshold(rule, option, at_most):
+    value = getattr(rule, option)
+    if value is None:
+        return np.inf if at_most else -np.inf
+    return value
+
+
+def _area_pattern(areas):
+    return "|".join(re.escape(area) for area in areas)
+
+
+def _places(listings_df):
+    """address and area of every listing as one text, None without either"""
+    columns = [column for column in ("address", "area") if column in listings_df]
+    if not columns:
+        return None
+    texts = [listings_df[column].astype("string").fillna("") for column in columns]
+    return texts[0].str.cat(texts[1:], sep=" ") if len(texts) > 1 else texts[0]
+
+
+class RuleSet:
+    """rules compiled into threshold arrays, plus the score weights
+
+    The score is the sum of each weighted column, missing values count as
+    0 and the energy label counts as its rank, 0 for G up to 10 for A++++.
+    """
+
+    def __init__(self, rules=(), weights=None, min_score=None):
+        self.rules = list(rules)
+        self.weights = dict(weights or {})
+        self.min_score = min_score
+        self.names = np.array([rule.name for rule in self.rules], dtype=object)
+        # One column per rule, inf and -inf stand for no threshold
+        self.thresholds = {
+            column: np.array(
+                [_threshold(rule, option, at_most) for rule in self.rules],
+                dtype=float,
+            )
+            for option, column, at_most in THRESHOLDS
+        }
+        self.min_label_codes = np.array(
+            [
+                -1
+                if rule.min_energy_label is None
+                else ENERGY_LABELS.index(rule.min_energy_label)
+                for rule in self.rules
+            ]
+        )
+        # Rules sharing the same area or site lists share one mask
+        self.area_groups = {}
+        for index, rule in enumerate(self.rules):
+            key = (rule.include_areas, rule.exclude_areas, rule.sites)
+            self.area_groups.setdefault(key, []).append(index)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def matches(self, listings_df):
+        """boolean array with a row per listing and a column per rule"""
+        rows = len(listings_df)
+        matched = np.ones((rows, len(self.rules)), dtype=bool)
+        for option, column, at_most in THRESHOLDS:
+            if column not in listings_df:
+                continue
+            values = listings_df[column].astype("Float64").to_numpy(
+                dtype=float, na_value=np.nan
+            )[:, None]
+            limits = self.thresholds[column][None, :]
+            within = values <= limits if at_most else values >= limits
+            matched &= within | np.isnan(values)
+
+        if "energy_label" in listings_df:
+            codes = listings_df["energy_label"].cat.codes.to_numpy()[:, None]
+            matched &= (codes >= self.min_label_codes[None, :]) | (codes == -1)
+
+        places = _places(listings_df) if self.area_groups else None
+        for (include, exclude, sites), indexes in self.area_groups.items():
+            group = np.ones(rows, dtype=bool)
+            if include and places is not None:
+                group &= places.str.contains(
+                    _area_pattern(include), case=False, na=False
+                ).to_numpy(dtype=bool)
+            if exclude and places is not None:
+                group &= ~places.str.contains(
+                    _area_pattern(exclude), case=False, na=False
+                ).to_numpy(dtype=bool)
+            if sites and "source" in listings_df:
+                group &= listings_df["source"].isin(sites).to_numpy()
+            matched[:, indexes] &= group[:, None]
+        return matched
+
+    def scores(self, listings_df):
+        """weighted score of every listing as a float array"""
+        score = np.zeros(len(listings_df))
+        for column, weight in self.weights.items():
+            if column not in listings_df:
+                continue
+            values = listings_df[column]
+            if column == "energy_label":
+                values = values.cat.codes.where(values.cat.codes >= 0)
+            values = values.astype("Float64").fillna(0)
+            score += weight * values.to_numpy(dtype=float)
+        return score
+
+    def apply(self, listings_df):
+        """the listings matching any rule, best scored first, with a score
+        and the name of the first matching rule
+
+        Without rules every listing matches.
+        """
+        listings_df = listings_df.assign(score=self.scores(listings_df))
+        if self.rules:
+            matched = self.matches(listings_df)
+            keep = matched.any(axis=1)
+            listings_df = listings_df.assign(
+                matched_rule=np.where(keep, self.names[matched.argmax(axis=1)], "")
+            )[keep]
+        if self.min_score is not None:
+            listings_df = listings_df[listings_df["score"] >= self.min_score]
+        return listings_df.sort_values("score", ascending=False, kind="stable")
+
+
+def load_rules(path=RULES_PATH):
+    """rules and weights from a json file, no rules when it is missing
+
+    The file holds a "rules" list of objects with a name and any of
+    max_price, max_price_per_m2, min_size, min_energy_label,
+    include_areas, exclude_areas and sites, plus optional "weights" per
+    column and a "min_score". A file that cannot be read as such raises
+    ValueError.
+    """
+    if not os.path.exists(path):
+        return RuleSet()
+    with open(path, encoding="utf-8") as rules_file:
+        try:
+            config = json.load(rules_file)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path} is not valid JSON: {e}") from e
+    if not isinstance(config, dict):
+        raise ValueError(f"{path} must hold an object with a rules list")
+    rules = []
+    for index, entry in enumerate(config.get("rules", []), start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Rule {index} in {path} is no object: {entry!r}")
+        entry = {"name": f"rule-{index}", **entry}
+        unknown = sorted(set(entry) - set(RULE_OPTIONS))
+        if unknown:
+            raise ValueError(
+                f"Unknown options in rule {entry['name']}: {', '.join(unknown)}"
+            )
+        rules.append(Rule(**entry))
+    weights = config.get("weights") or {}
+    min_score = config.get("min_score")
+    if not all(_is_number(weight) for weight in weights.values()):
+        raise ValueError(f"Weights in {path} must be numbers: {weights!r}")
+    if min_score is not None and not _is_number(min_score):
+        raise ValueError(f"min_score in {path} is no number: {min_score!r}")
+    return RuleSet(rules=rules, weights=weights, min_score=min_score)
@@ -0,0 +1,52 @@
+"""In-process scheduler that runs each polling job on its own interval"""
+
+import asyncio
+import random
+
+
+class Job:
+    """a coroutine function to run every interval seconds"""
+
+    def __init__(self, name, interval, func, jitter):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.jitter = jitter
+        self.runs = 0
+        self.failures = 0
+
+    def next_delay(self):
+        """interval shifted by a random fraction of itself"""
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class Scheduler:
+    """runs jobs forever, a failing run never stops the other jobs"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def every(self, interval, func, name=None, jitter=0.1):
+        """register func to be awaited every interval seconds"""
+        job = Job(name or func.__name__, interval, func, jitter)
+        self.jobs.append(job)
+        return job
+
+    async def run(self):
+        """run every registered job until cancelled"""
+        await asyncio.gather(*(self._loop(job) for job in self.jobs))
+
+    async def _loop(self, job):
+        loop = asyncio.get_running_loop()
+        # Spread the first runs so the sites are not all hit at once
+        await asyncio.sleep(random.uniform(0, job.interval * job.jitter))
+        while True:
+            started = loop.time()
+            try:
+                await job.func()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                job.failures += 1
+                print(f"Error in {job.name} job: {e}")
+            job.runs += 1
+            elapsed = loop.time() - started
+            await asyncio.sleep(max(job.next_delay() - elapsed, 0))
@@ -0,0 +1,56 @@
+"""Saved searches: which results pages to watch on which site"""
+
+import json
+import os
+
+SEARCHES_PATH = os.environ.get("SEARCHES_PATH", "searches.json")
+
+
+class Search:
+    """a saved search on one of the sites"""
+
+    def __init__(self, name, site, url, max_pages=None):
+        self.name = name
+        self.site = site
+        self.url = url
+        # None uses the crawler's default page limit
+        self.max_pages = max_pages
+
+    def __repr__(self):
+        return f"Search({self.name!r}, {self.site!r})"
+
+
+# URL for the properties listing in Amsterdam
+VBO_URL = "https://www.vbo.nl/koopwoningen?q=Amsterdam&straal=&koopprijs_van=&koopprijs_tot=450000&aantal_kamers=3&oppervlakte=50m&toon_aanbod_sinds=3+d"  # pylint: disable=line-too-long
+PARARIUS_URL = (
+    "https://www.pararius.nl/koopwoningen/amsterdam/0-500000/2-slaapkamers/50m2/sinds-3"
+)
+HUISLIJN_URL = "https://www.huislijn.nl/koopwoning/nederland/noord-holland?order=relevance&c-houseFrom=-3&c-maxPrice=450000&c-livingArea=49&c-nrRooms=2&c-municipality=Amsterdam"  # pylint: disable=line-too-long
+
+# Searches watched when there is no searches.json
+DEFAULT_SEARCHES = (
+    Search("pararius", "pararius", PARARIUS_URL),
+    Search("vbo", "vbo", VBO_URL),
+    Search("huislijn", "huislijn", HUISLIJN_URL),
+)
+
+
+def load_searches(path=SEARCHES_PATH, default=()):
+    """searches listed in a json file, the default ones when it is missing
+
+    The file holds a list of objects with a site and a url, and optionally
+    a name and max_pages.
+    """
+    if not os.path.exists(path):
+        return list(default)
+    with open(path, encoding="utf-8") as searches_file:
+        entries = json.load(searches_file)
+    return [
+        Search(
+            name=entry.get("name", f"{entry['site']}-{index}"),
+            site=entry["site"],
+            url=entry["url"],
+            max_pages=entry.get("max_pages"),
+        )
+        for index, entry in enumerate(entries, start=1)
+    ]
@@ -0,0 +1,137 @@
+"""Local on-disk index of the listings already registered in the sheet"""
+
+import os
+import sqlite3
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+SEEN_INDEX_PATH = os.environ.get("SEEN_INDEX_PATH", "seen_listings.sqlite3")
+# Query parameters that never change which listing a url points to
+TRACKING_PARAMETERS = ("utm_", "gclid", "fbclid")
+# Keys looked up per query, stays well below sqlite's variable limit
+LOOKUP_CHUNK_SIZE = 500
+
+
+def normalize_url(url):
+    """canonical key for a listing url
+
+    Scheme, a leading www., trailing slashes, fragments, tracking parameters
+    and the order of the remaining query parameters are ignored.
+    """
+    parts = urlsplit(str(url).strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = "/" + "/".join(segment for segment in parts.path.split("/") if segment)
+    query = urlencode(
+        sorted(
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not name.startswith(TRACKING_PARAMETERS)
+        )
+    )
+    return f"{host}{path}?{query}" if query else f"{host}{path}"
+
+
+class SeenIndex:
+    """sqlite table of normalized listing urls with o(1) lookups
+
+    Every change runs in a transaction, so a crash mid-write leaves the index
+    as it was before. The index is rebuilt from the sheet the first time it
+    is used and whenever reconcile is called.
+    """
+
+    def __init__(self, path=SEEN_INDEX_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS seen ("
+                "key TEXT PRIMARY KEY, url TEXT NOT NULL, first_seen TEXT NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def __contains__(self, url):
+        row = self.connection.execute(
+            "SELECT 1 FROM seen WHERE key = ?", (normalize_url(url),)
+        ).fetchone()
+        return row is not None
+
+    def close(self):
+        """close the database connection"""
+        self.connection.close()
+
+    @property
+    def reconciled_at(self):
+        """when the index was last rebuilt from the sheet, None if never"""
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE name = 'reconciled_at'"
+        ).fetchone()
+        return row[0] if row else None
+
+    def seen_keys(self, keys):
+        """the subset of the normalized keys already in the index"""
+        keys = list(keys)
+        seen = set()
+        for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+            chunk = keys[start : start + LOOKUP_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            seen.update(
+                row[0]
+                for row in self.connection.execute(
+                    f"SELECT key FROM seen WHERE key IN ({placeholders})", chunk
+                )
+            )
+        return seen
+
+    def contains_all(self, urls):
+        """whether every one of the urls was seen before"""
+        keys = {normalize_url(url) for url in urls}
+        return len(self.seen_keys(keys)) == len(keys)
+
+    def filter_new(self, listings_df, column="URL"):
+        """listings whose url is not in the index yet"""
+        if listings_df.empty:
+            return listings_df
+        keys = listings_df[column].map(normalize_url)
+        new_mask = ~keys.isin(self.seen_keys(keys.unique())) & ~keys.duplicated()
+        return listings_df[new_mask]
+
+    def add(self, urls):
+        """record the urls as seen"""
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO seen (key, url, first_seen) VALUES (?, ?, ?)",
+                ((normalize_url(url), url, now) for url in urls if url),
+            )
+
+    def reconcile(self, urls):
+        """replace the index with the given urls, returns (added, removed)"""
+        keys = {normalize_url(url): url for url in urls if url}
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self.connection:
+            current = {
+                row[0] for row in self.connection.execute("SELECT key FROM seen")
+            }
+            removed = current - keys.keys()
+            added = keys.keys() - current
+            self.connection.executemany(
+                "DELETE FROM seen WHERE key = ?", ((key,) for key in removed)
+            )
+            self.connection.executemany(
+                "INSERT INTO seen (key, url, first_seen) VALUES (?, ?, ?)",
+                ((key, keys[key], now) for key in added),
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('reconciled_at', ?)",
+                (now,),
+            )
+        return len(added), len(removed)
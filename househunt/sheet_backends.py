@@ -0,0 +1,304 @@
+"""Storage backends for the listings sheet: Google Sheets, a local stand-in
+with the same methods, and recording or replaying the calls made to one"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+
+# gspread, local, record (gspread while saving every call) or replay
+SHEET_BACKEND = os.environ.get("SHEET_BACKEND", "gspread")
+# SQLite file of the local sheet, ":memory:" keeps it for one run only
+SHEET_LOCAL_PATH = os.environ.get("SHEET_LOCAL_PATH", "local_sheet.sqlite3")
+# Json-lines file the calls are recorded to and replayed from
+SHEET_RECORD_PATH = os.environ.get("SHEET_RECORD_PATH", "sheet_calls.jsonl")
+# Seconds added to every call, to mimic the round trip to Google
+SHEET_LATENCY = float(os.environ.get("SHEET_LATENCY", "0"))
+# Calls allowed per minute before 429 errors are raised, 0 for no limit
+SHEET_QUOTA_PER_MINUTE = int(os.environ.get("SHEET_QUOTA_PER_MINUTE", "0"))
+# Seconds before a Google Sheets request fails in its worker thread, appends
+# are waited for until then instead of SINK_TIMEOUT
+SHEET_TIMEOUT = float(os.environ.get("SHEET_TIMEOUT", "60"))
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+# The worksheet methods the scrapers use
+SHEET_METHODS = ("get_all_records", "row_values", "col_values", "update", "append_rows")
+
+
+def api_error(status_code, message):
+    """gspread APIError as the Sheets api would raise it"""
+    # gspread and google-auth take long to import, they are only imported
+    # where a backend needs them
+    import requests  # pylint: disable=import-outside-toplevel
+    from gspread.exceptions import APIError  # pylint: disable=import-outside-toplevel
+
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(  # pylint: disable=protected-access
+        {"error": {"code": status_code, "message": message, "status": ""}}
+    ).encode("utf-8")
+    return APIError(response)
+
+
+def _cell(value):
+    """the text a cell shows for a written value"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _trimmed(values):
+    """values without the trailing empty cells, as the api leaves them out"""
+    end = len(values)
+    while end and values[end - 1] == "":
+        end -= 1
+    return values[:end]
+
+
+class LocalSheet:
+    """worksheet kept in SQLite that answers like a gspread worksheet
+
+    Rows are stored as json lists of cell texts. Calls may come from the
+    worker threads, so the connection is shared behind a lock.
+    """
+
+    def __init__(self, path=SHEET_LOCAL_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rows (number INTEGER PRIMARY KEY, cells TEXT)"
+        )
+        self._db.commit()
+
+    def _rows(self):
+        """every row up to the last stored one, missing rows as empty lists"""
+        stored = dict(self._db.execute("SELECT number, cells FROM rows"))
+        last = max(stored, default=0)
+        return [json.loads(stored.get(number, "[]")) for number in range(1, last + 1)]
+
+    def _last_row(self):
+        for number, cells in self._db.execute(
+            "SELECT number, cells FROM rows ORDER BY number DESC"
+        ):
+            if any(json.loads(cells)):
+                return number
+        return 0
+
+    def _write_rows(self, first_row, first_col, values):
+        for offset, row_values in enumerate(values):
+            number = first_row + offset
+            found = self._db.execute(
+                "SELECT cells FROM rows WHERE number = ?", (number,)
+            ).fetchone()
+            cells = json.loads(found[0]) if found else []
+            end = first_col - 1 + len(row_values)
+            cells.extend([""] * (end - len(cells)))
+            cells[first_col - 1 : end] = [_cell(value) for value in row_values]
+            self._db.execute(
+                "INSERT OR REPLACE INTO rows (number, cells) VALUES (?, ?)",
+                (number, json.dumps(cells)),
+            )
+        self._db.commit()
+
+    def get_all_records(self):
+        """rows below the header as dicts, numbers turned into numbers"""
+        from gspread.utils import numericise  # pylint: disable=import-outside-toplevel
+
+        with self._lock:
+            rows = self._rows()
+        if not rows:
+            return []
+        header = rows[0]
+        return [
+            {
+                column: numericise(row[i]) if i < len(row) else ""
+                for i, column in enumerate(header)
+            }
+            for row in rows[1:]
+        ]
+
+    def row_values(self, row):
+        """cells of a row, counting from 1"""
+        with self._lock:
+            found = self._db.execute(
+                "SELECT cells FROM rows WHERE number = ?", (row,)
+            ).fetchone()
+        return _trimmed(json.loads(found[0])) if found else []
+
+    def col_values(self, col):
+        """cells of a column, counting from 1"""
+        with self._lock:
+            rows = self._rows()
+        return _trimmed([row[col - 1] if col <= len(row) else "" for row in rows])
+
+    def update(self, values=None, range_name=None, **kwargs):  # pylint: disable=unused-argument
+        """write the values starting at the top left cell of the range"""
+        from gspread.utils import a1_to_rowcol  # pylint: disable=import-outside-toplevel
+
+        first_row, first_col = a1_to_rowcol((range_name or "A1").split(":")[0])
+        with self._lock:
+            self._write_rows(first_row, first_col, values or [])
+        return {"updatedRows": len(values or [])}
+
+    def append_rows(self, values, table_range=None, **kwargs):  # pylint: disable=unused-argument
+        """write the rows below the last row holding a value"""
+        from gspread.utils import a1_to_rowcol  # pylint: disable=import-outside-toplevel
+
+        first_col = a1_to_rowcol(table_range.split(":")[0])[1] if table_range else 1
+        with self._lock:
+            self._write_rows(self._last_row() + 1, first_col, values)
+        return {"updates": {"updatedRows": len(values)}}
+
+    def clear(self):
+        """remove every row"""
+        with self._lock:
+            self._db.execute("DELETE FROM rows")
+            self._db.commit()
+
+
+class ThrottledSheet:
+    """adds latency and a per-minute quota to the calls of another sheet"""
+
+    def __init__(self, sheet, latency=SHEET_LATENCY, quota=SHEET_QUOTA_PER_MINUTE):
+        self.sheet = sheet
+        self.latency = latency
+        self.quota = quota
+        self.calls = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._recent = deque()
+
+    def __getattr__(self, name):
+        method = getattr(self.sheet, name)
+        if name not in SHEET_METHODS:
+            return method
+
+        def call(*args, **kwargs):
+            self._admit()
+            if self.latency:
+                time.sleep(self.latency)
+            return method(*args, **kwargs)
+
+        return call
+
+    def _admit(self):
+        with self._lock:
+            self.calls += 1
+            if not self.quota:
+                return
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.quota:
+                self.rejected += 1
+                raise api_error(429, "Quota exceeded for quota metric 'Write requests'")
+            self._recent.append(now)
+
+
+class RecordingSheet:
+    """passes calls on to another sheet and saves each call and its answer"""
+
+    def __init__(self, sheet, path=SHEET_RECORD_PATH):
+        self.sheet = sheet
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self.sheet, name)
+        if name not in SHEET_METHODS:
+            return method
+
+        from gspread.exceptions import APIError  # pylint: disable=import-outside-toplevel
+
+        def call(*args, **kwargs):
+            entry = {"method": name, "args": args, "kwargs": kwargs}
+            try:
+                entry["result"] = method(*args, **kwargs)
+                return entry["result"]
+            except APIError as e:
+                entry["error"] = {"code": e.code, "message": str(e)}
+                raise
+            finally:
+                self._save(entry)
+
+        return call
+
+    def _save(self, entry):
+        with self._lock, open(self.path, "a", encoding="utf-8") as record_file:
+            record_file.write(json.dumps(entry, default=str) + "\n")
+
+
+class ReplaySheet:
+    """answers every call with the next recorded answer of that method
+
+    Arguments are not compared, so a replay follows the recorded run as
+    long as the calls come in the same order.
+    """
+
+    def __init__(self, path=SHEET_RECORD_PATH):
+        self.answers = defaultdict(deque)
+        with open(path, encoding="utf-8") as record_file:
+            for line in record_file:
+                entry = json.loads(line)
+                self.answers[entry["method"]].append(entry)
+
+    def __getattr__(self, name):
+        if name not in SHEET_METHODS:
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):  # pylint: disable=unused-argument
+            if not self.answers[name]:
+                raise LookupError(f"No recorded {name} call left to replay")
+            entry = self.answers[name].popleft()
+            if "error" in entry:
+                raise api_error(entry["error"]["code"], entry["error"]["message"])
+            return entry.get("result")
+
+        return call
+
+
+def open_google_sheet(
+    spreadsheet_id, sheet_name, credentials_file, timeout=SHEET_TIMEOUT
+):
+    """authenticate with the service account and open the worksheet, every
+    request failing after timeout seconds"""
+    import gspread  # pylint: disable=import-outside-toplevel
+    from google.oauth2.service_account import Credentials  # pylint: disable=import-outside-toplevel
+
+    creds = Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
+    client = gspread.authorize(creds)
+    # The worker thread gives up too, not only the caller waiting for it
+    client.set_timeout(timeout)
+    return client.open_by_key(spreadsheet_id).worksheet(sheet_name)
+
+
+def open_sheet(
+    spreadsheet_id,
+    sheet_name,
+    credentials_file,
+    backend=SHEET_BACKEND,
+    latency=SHEET_LATENCY,
+    quota=SHEET_QUOTA_PER_MINUTE,
+):
+    """worksheet of the configured backend, with latency and quota injected
+    when set"""
+    if backend == "gspread":
+        sheet = open_google_sheet(spreadsheet_id, sheet_name, credentials_file)
+    elif backend == "record":
+        sheet = RecordingSheet(
+            open_google_sheet(spreadsheet_id, sheet_name, credentials_file)
+        )
+    elif backend == "replay":
+        sheet = ReplaySheet()
+    elif backend == "local":
+        sheet = LocalSheet()
+    else:
+        raise ValueError(f"Unknown sheet backend: {backend}")
+    if latency or quota:
+        sheet = ThrottledSheet(sheet, latency, quota)
+    return sheet
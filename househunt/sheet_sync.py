@@ -0,0 +1,146 @@
+"""Incremental Google Sheet sync: append new rows instead of rewriting the sheet"""
+
+import os
+import time
+from househunt.normalize import blank_missing
+from househunt.offload import retry_call
+
+# Rows sent per append request
+SHEET_BATCH_SIZE = int(os.environ.get("SHEET_BATCH_SIZE", "500"))
+# Seconds between append requests, keeps bursts within the per-minute quota
+SHEET_BATCH_PAUSE = float(os.environ.get("SHEET_BATCH_PAUSE", "1"))
+
+
+def _status_code(error):
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+
+def is_quota_error(error):
+    """the request was rejected for going over the api quota"""
+    # gspread and requests are only imported once a call failed
+    from gspread.exceptions import APIError  # pylint: disable=import-outside-toplevel
+
+    return isinstance(error, APIError) and _status_code(error) == 429
+
+
+def is_transient_error(error):
+    """the request may succeed when repeated"""
+    import requests  # pylint: disable=import-outside-toplevel
+    from gspread.exceptions import APIError  # pylint: disable=import-outside-toplevel
+
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return isinstance(error, APIError) and (
+        _status_code(error) == 429 or (_status_code(error) or 0) >= 500
+    )
+
+
+class SheetSync:
+    """keeps an index of the urls in the sheet and only appends unseen rows
+
+    Reading the index costs the header row plus the url column, never the
+    whole sheet, and writing costs one append per batch of new rows. Reads
+    are retried on any transient error, appends only when the api rejected
+    them for the quota, as anything else may have added the rows already.
+    """
+
+    def __init__(
+        self,
+        sheet,
+        key_column="URL",
+        batch_size=SHEET_BATCH_SIZE,
+        batch_pause=SHEET_BATCH_PAUSE,
+    ):
+        self.sheet = sheet
+        self.key_column = key_column
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.header = None
+        self.known = None
+
+    def load(self):
+        """read the header and the url column of the sheet"""
+        self.header = self._read(self.sheet.row_values, 1)
+        if self.key_column in self.header:
+            column = self.header.index(self.key_column) + 1
+            self.known = {
+                value
+                for value in self._read(self.sheet.col_values, column)[1:]
+                if value
+            }
+        else:
+            self.known = set()
+
+    def urls(self):
+        """every url currently in the sheet"""
+        self.load()
+        return set(self.known)
+
+    def _ensure_loaded(self):
+        if self.known is None:
+            self.load()
+
+    def _ensure_header(self):
+        if self.header is None:
+            self.header = self._read(self.sheet.row_values, 1)
+
+    @staticmethod
+    def _read(func, *args):
+        return retry_call(func, *args, retry_if=is_transient_error)
+
+    @staticmethod
+    def _write(func, *args, **kwargs):
+        return retry_call(func, *args, retry_if=is_quota_error, **kwargs)
+
+    def filter_new(self, listings_df):
+        """listings whose url is not in the sheet yet"""
+        self._ensure_loaded()
+        if listings_df.empty:
+            return listings_df
+        new_listings = listings_df[~listings_df[self.key_column].isin(self.known)]
+        return new_listings.drop_duplicates(subset=self.key_column)
+
+    def row_batches(self, new_listings_df):
+        """the listings as rows in the sheet's column order, split into
+        append batches of (rows, urls)
+
+        Columns the sheet does not have yet are added to its header first.
+        """
+        self._ensure_header()
+        if new_listings_df.empty:
+            return []
+
+        missing_columns = [
+            column for column in new_listings_df.columns if column not in self.header
+        ]
+        if missing_columns:
+            self.header = self.header + missing_columns
+            self._write(self.sheet.update, values=[self.header], range_name="A1")
+
+        rows = blank_missing(new_listings_df.reindex(columns=self.header))
+        rows = rows.values.tolist()
+        urls = list(new_listings_df[self.key_column])
+        size = self.batch_size
+        return [
+            (rows[start : start + size], urls[start : start + size])
+            for start in range(0, len(rows), size)
+        ]
+
+    def append_batch(self, rows, urls):
+        """append one batch of rows below the existing rows"""
+        self._write(self.sheet.append_rows, rows, table_range="A1")
+        if self.known is not None:
+            self.known.update(urls)
+
+    def append(self, new_listings_df):
+        """append the listings below the existing rows in batches"""
+        for index, (rows, urls) in enumerate(self.row_batches(new_listings_df)):
+            if index:
+                time.sleep(self.batch_pause)
+            self.append_batch(rows, urls)
+
+    def sync(self, listings_df):
+        """append the unseen listings and return them"""
+        new_listings = self.filter_new(listings_df)
+        self.append(new_listings)
+        return new_listings
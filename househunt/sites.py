@@ -0,0 +1,165 @@
+"""Declarative extraction specs per site and the engine that applies them"""
+
+import soupsieve
+from househunt.listing import Listing
+from househunt.pagination import NextLink, PageNumbers
+from househunt.parsing import class_strainer, make_soup
+
+
+def prefix(url_prefix):
+    """post-processor turning a relative link into a full url"""
+    return lambda value: url_prefix + value
+
+
+def labelled_value(selector, label):
+    """extractor reading "label: value" from the first element whose text
+    contains the label"""
+    compiled = soupsieve.compile(selector)
+
+    def extract(item):
+        for element in compiled.select(item):
+            text = element.get_text()
+            if label in text:
+                return text.split(":")[1].strip()
+        return None
+
+    return extract
+
+
+class FieldSpec:
+    """how to read one listing field from a listing container
+
+    The value is the attribute of the first element matching the selector,
+    or its text when no attribute is given. strip_each strips every text
+    fragment before joining them, otherwise only the joined text is stripped.
+    A custom extract function replaces the selector altogether.
+    """
+
+    def __init__(
+        self,
+        selector=None,
+        attr=None,
+        strip_each=False,
+        post=None,
+        default=None,
+        extract=None,
+    ):
+        self.selector = soupsieve.compile(selector) if selector else None
+        self.attr = attr
+        self.strip_each = strip_each
+        self.post = post
+        self.default = default
+        self.custom_extract = extract
+
+    def extract(self, item):
+        """value of the field for a listing container"""
+        if self.custom_extract is not None:
+            value = self.custom_extract(item)
+        else:
+            element = self.selector.select_one(item) if self.selector else item
+            if element is None:
+                value = None
+            elif self.attr:
+                value = element.get(self.attr)
+            elif self.strip_each:
+                value = element.get_text(strip=True)
+            else:
+                value = element.get_text().strip()
+        if value is not None and self.post is not None:
+            value = self.post(value)
+        return self.default if value is None else value
+
+
+class SiteSpec:
+    """where the listings are on a site's results page and how to read them"""
+
+    def __init__(
+        self, name, container, strainer, ready_selector, fields, pagination=None
+    ):
+        self.name = name
+        self.container = soupsieve.compile(container)
+        self.strainer = strainer
+        # Selector that proves the results were rendered
+        self.ready_selector = ready_selector
+        self.fields = fields
+        # PageNumbers or NextLink, None when only the first page is read
+        self.pagination = pagination
+
+
+SITES = {
+    "pararius": SiteSpec(
+        name="pararius",
+        container="li[class='search-list__item search-list__item--listing']",
+        strainer=class_strainer("li", "search-list__item--listing"),
+        ready_selector="li.search-list__item--listing",
+        fields={
+            "address": FieldSpec(
+                "a[class='listing-search-item__link listing-search-item__link--title']",
+                strip_each=True,
+            ),
+            "area": FieldSpec(".listing-search-item__sub-title"),
+            "url": FieldSpec(
+                "a[class='listing-search-item__link listing-search-item__link--depiction']",
+                attr="href",
+                post=prefix("https://www.pararius.nl"),
+            ),
+            "size": FieldSpec(
+                "li[class='illustrated-features__item illustrated-features__item--surface-area']",
+                strip_each=True,
+                default="N/A",
+            ),
+            "price": FieldSpec(
+                "div[class='listing-search-item__price']", strip_each=True
+            ),
+        },
+        pagination=PageNumbers("{url}/page-{page}", "a", "pagination__link"),
+    ),
+    "vbo": SiteSpec(
+        name="vbo",
+        container="a[class='propertyLink']",
+        strainer=class_strainer("a", "propertyLink"),
+        ready_selector="a.propertyLink",
+        fields={
+            "url": FieldSpec(attr="href"),
+            "address": FieldSpec("span.street"),
+            "area": FieldSpec("span.city"),
+            "price": FieldSpec("span.price"),
+            "energy_label": FieldSpec("span.energielabel"),
+            "size": FieldSpec(extract=labelled_value("li", "Woonoppervlakte")),
+        },
+        pagination=NextLink(),
+    ),
+    "huislijn": SiteSpec(
+        name="huislijn",
+        container="div[class='object-panel']",
+        strainer=class_strainer("div", "object-panel"),
+        ready_selector="div.wrapper-objects",
+        fields={
+            "url": FieldSpec("a", attr="href", post=prefix("https://www.huislijn.nl/")),
+            "address": FieldSpec("h2.object-street"),
+            "area": FieldSpec("div.object-place"),
+            "price": FieldSpec("div.object-price"),
+        },
+        pagination=NextLink(),
+    ),
+}
+
+
+def extract_listings(spec, html_content, batch, timestamp=""):
+    """add every listing on a results page to the batch, returns how many"""
+    return extract_from_soup(
+        spec, make_soup(html_content, spec.strainer), batch, timestamp
+    )
+
+
+def extract_from_soup(spec, soup, batch, timestamp=""):
+    """add every listing of an already strained results page to the batch"""
+    added = 0
+    for item in spec.container.select(soup):
+        values = {name: field.extract(item) for name, field in spec.fields.items()}
+        # Without a url the listing cannot be told apart from the others
+        if not values.get("url"):
+            continue
+        batch.append(Listing(source=spec.name, timestamp=timestamp, **values))
+        added += 1
+    return added
@@ -0,0 +1,47 @@
+"""Local smtp server printing every email it receives, for trying the notifier
+
+Usage: python -m househunt.smtp_debug --port 8025
+then set SMTP_SERVER=localhost, SMTP_PORT=8025, SMTP_STARTTLS=false and
+leave EMAIL_PASSWORD empty.
+"""
+
+import argparse
+import time
+from aiosmtpd.controller import Controller  # pylint: disable=import-error
+
+
+class PrintingHandler:
+    """aiosmtpd handler printing the envelope and the message"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):  # pylint: disable=invalid-name,unused-argument
+        """print a received message"""
+        self.messages.append(envelope)
+        print(f"From: {envelope.mail_from}")
+        print(f"Recipients: {', '.join(envelope.rcpt_tos)}")
+        print(envelope.content.decode("utf-8", errors="replace"))
+        print("-" * 40)
+        return "250 Message accepted for delivery"
+
+
+def start_server(host="localhost", port=8025):
+    """start the server in a background thread, returns its controller"""
+    controller = Controller(PrintingHandler(), hostname=host, port=port)
+    controller.start()
+    return controller
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+    smtp_controller = start_server(args.host, args.port)
+    print(f"Listening on {args.host}:{args.port}, press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        smtp_controller.stop()
@@ -0,0 +1,78 @@
+"""Hand out the listings of every search as soon as its crawl finished"""
+
+import asyncio
+import os
+
+# Crawled searches waiting to be stored before the crawlers have to wait
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", "2"))
+# Seconds a run may take before unfinished searches are dropped, 0 for none
+RUN_DEADLINE = float(os.environ.get("RUN_DEADLINE", "600"))
+
+
+class SearchStream:
+    """crawls every search concurrently and yields (search, batch) pairs in
+    the order the crawls finish, batch being None when the crawl failed
+
+    The queue between the crawlers and the consumer is bounded, so while
+    the consumer is busy storing listings the finished crawlers wait
+    instead of piling up results. Once the deadline passed the searches
+    still crawling are cancelled and listed in unfinished, those whose
+    crawl finished are still handed out.
+    """
+
+    def __init__(
+        self, searches, produce, queue_size=STREAM_QUEUE_SIZE, deadline=RUN_DEADLINE
+    ):
+        self.searches = list(searches)
+        self.produce = produce
+        self.deadline = deadline
+        self.unfinished = []
+        # Searches whose crawl finished, queued or waiting for a place
+        self._crawled = []
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+
+    async def __aenter__(self):
+        self._tasks = [
+            asyncio.create_task(self._run(search)) for search in self.searches
+        ]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, search):
+        try:
+            batch = await self.produce(search)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Error crawling the {search.name} search: {e!r}")
+            batch = None
+        self._crawled.append(search)
+        await self._queue.put((search, batch))
+
+    def __aiter__(self):
+        return self._results()
+
+    async def _results(self):
+        loop = asyncio.get_running_loop()
+        ends_at = loop.time() + self.deadline if self.deadline else None
+        pending = list(self.searches)
+        while pending:
+            timeout = None if ends_at is None else max(0, ends_at - loop.time())
+            try:
+                search, batch = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                self.unfinished = [
+                    search for search in pending if search not in self._crawled
+                ]
+                for search, task in zip(self.searches, self._tasks):
+                    if search not in self._crawled:
+                        task.cancel()
+                # The finished crawls get into the queue as it is emptied
+                pending = [search for search in pending if search in self._crawled]
+                ends_at = None
+                continue
+            pending.remove(search)
+            yield search, batch
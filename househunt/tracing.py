@@ -0,0 +1,163 @@
+"""Timing spans and counters per site and stage, written as a json-lines run log"""
+
+import asyncio
+import contextvars
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+RUN_LOG_PATH = os.environ.get("RUN_LOG_PATH", "run_log.jsonl")
+
+# Site the current task works for, spans and counters default to it
+current_site = contextvars.ContextVar("current_site", default=None)
+# Selects the spans and counters of no site, such as the sheet read at
+# start-up or the history compaction, reports label them "run"
+RUN_SITE = "run"
+
+
+def _of_site(entry_site, site):
+    """whether a span or counter of entry_site belongs to the report of
+    site, every one does for None"""
+    if site is None:
+        return True
+    if site == RUN_SITE:
+        return entry_site is None
+    return entry_site == site
+
+
+class Tracer:
+    """collects spans and counters until a run is written to the log
+
+    Totals since start-up are kept apart for the Prometheus exporter, so
+    writing a run does not reset them.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.counters = Counter()
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = Counter()
+        self.counter_totals = Counter()
+
+    @contextmanager
+    def span(self, stage, site=None):
+        """time the block as a stage of the site's run"""
+        site = site or current_site.get()
+        started = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            self.spans.append(
+                {
+                    "site": site,
+                    "stage": stage,
+                    "seconds": round(duration, 6),
+                    "ok": ok,
+                }
+            )
+            self.stage_seconds[(site, stage)] += duration
+            self.stage_calls[(site, stage)] += 1
+
+    def count(self, name, value=1, site=None):
+        """add to a counter such as bytes_fetched or new_listings"""
+        key = (site or current_site.get(), name)
+        self.counters[key] += value
+        self.counter_totals[key] += value
+
+    def report(self, site=None):
+        """run record of the spans and counters of a site, all when None
+        and those of no site for RUN_SITE"""
+        spans = [s for s in self.spans if _of_site(s["site"], site)]
+        stages = defaultdict(float)
+        for span in spans:
+            stages[f"{span['site'] or 'run'}.{span['stage']}"] += span["seconds"]
+        counters = defaultdict(dict)
+        for (counter_site, name), value in self.counters.items():
+            if _of_site(counter_site, site):
+                counters[counter_site or "run"][name] = value
+        return {
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "site": site,
+            "stages": {name: round(seconds, 6) for name, seconds in stages.items()},
+            "counters": dict(counters),
+            "spans": spans,
+        }
+
+    def write_run_log(self, site=None, path=None):
+        """append the run record to the log and start a new run"""
+        record = self.report(site)
+        with open(path or RUN_LOG_PATH, "a", encoding="utf-8") as log_file:
+            log_file.write(json.dumps(record) + "\n")
+        self.spans = [s for s in self.spans if not _of_site(s["site"], site)]
+        self.counters = Counter(
+            {
+                key: value
+                for key, value in self.counters.items()
+                if not _of_site(key[0], site)
+            }
+        )
+        return record
+
+    def prometheus_text(self):
+        """totals since start-up in the Prometheus text format"""
+        lines = [
+            "# HELP househunt_stage_seconds_total Seconds spent per site and stage.",
+            "# TYPE househunt_stage_seconds_total counter",
+        ]
+        for (site, stage), seconds in sorted(self.stage_seconds.items(), key=str):
+            lines.append(
+                f'househunt_stage_seconds_total{{site="{site or "run"}",stage="{stage}"}} {seconds:.6f}'  # pylint: disable=line-too-long
+            )
+        lines += [
+            "# HELP househunt_stage_calls_total Times each site and stage ran.",
+            "# TYPE househunt_stage_calls_total counter",
+        ]
+        for (site, stage), calls in sorted(self.stage_calls.items(), key=str):
+            lines.append(
+                f'househunt_stage_calls_total{{site="{site or "run"}",stage="{stage}"}} {calls}'  # pylint: disable=line-too-long
+            )
+        for name in sorted({name for _, name in self.counter_totals}):
+            lines += [
+                f"# TYPE househunt_{name}_total counter",
+                *(
+                    f'househunt_{name}_total{{site="{site or "run"}"}} {value}'
+                    for (site, counter), value in sorted(
+                        self.counter_totals.items(), key=str
+                    )
+                    if counter == name
+                ),
+            ]
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every module, like the sheet and the browser pool
+tracer = Tracer()
+
+
+async def start_metrics_server(port, host="127.0.0.1", source=tracer):
+    """serve the Prometheus text of the tracer over plain http"""
+
+    async def handle(reader, writer):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        body = source.prometheus_text().encode("utf-8")
+        writer.write(
+            b"HTTP/1.0 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode("ascii")
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, host, port)
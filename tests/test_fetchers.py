@@ -0,0 +1,43 @@
+"""Ready selector check deciding whether the browser fallback is needed"""
+
+from pathlib import Path
+import pytest
+from househunt.fetchers import contains_selector
+from househunt.parsing import make_soup
+from househunt.sites import SITES
+
+FIXTURES = Path(__file__).parent.parent / "benchmarks" / "fixtures"
+
+
+@pytest.mark.parametrize("site", sorted(SITES))
+def test_ready_selector_found_on_the_results_page(site):
+    html_content = (FIXTURES / f"{site}.html").read_text(encoding="utf-8")
+    assert contains_selector(html_content, SITES[site].ready_selector)
+
+
+@pytest.mark.parametrize(
+    "html_content, expected",
+    [
+        ('<li class="search-list__item search-list__item--listing">', True),
+        ("<LI class='search-list__item--listing'>", True),
+        ("<li id=1 class=search-list__item--listing>", True),
+        ('<li class="search-list__item--listing-ad">', False),
+        ('<link class="search-list__item--listing">', False),
+        ('<li data-class="search-list__item--listing">', False),
+        ('<div class="search-list__item--listing">', False),
+        ("<style>li.search-list__item--listing { color: red }</style>", False),
+        ("", False),
+    ],
+)
+def test_tag_and_class_selector_on_raw_html(html_content, expected):
+    selector = "li.search-list__item--listing"
+    assert contains_selector(html_content, selector) is expected
+    if html_content:
+        parsed = make_soup(html_content).select_one(selector) is not None
+        assert parsed is expected
+
+
+def test_other_selectors_are_checked_on_the_parsed_page():
+    html_content = '<ul><li><a class="propertyLink" href="/1">1</a></li></ul>'
+    assert contains_selector(html_content, "ul a[href]")
+    assert not contains_selector(html_content, "ol a[href]")
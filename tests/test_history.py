@@ -0,0 +1,71 @@
+"""Gone listings of the history store and its compaction in a worker thread"""
+
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from househunt.history import HistoryStore
+from househunt.listing import Listing, ListingBatch
+from househunt.offload import run_blocking
+from househunt.pipeline import compact_history_file, listings_frame
+
+
+def moment(day):
+    return datetime(2026, 1, day, tzinfo=timezone.utc)
+
+
+def page_batch(page, urls):
+    batch = ListingBatch(
+        Listing("vbo", url, f"Javastraat {url[-1]}", "€ 425.000 k.k.") for url in urls
+    )
+    batch.pages[page] = list(urls)
+    return batch
+
+
+@pytest.fixture(name="history")
+def fixture_history(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    yield store
+    store.close()
+
+
+def record(history, batch, day):
+    history.record(listings_frame(batch), observed_at=moment(day), pages=batch.pages)
+
+
+def test_listing_missing_from_a_page_read_again_is_gone(history):
+    first = page_batch("https://vbo.nl/oost", ["https://vbo.nl/1", "https://vbo.nl/2"])
+    record(history, first, 1)
+    record(history, page_batch("https://vbo.nl/oost", ["https://vbo.nl/1"]), 2)
+
+    gone = history.gone_since(moment(2))
+    assert [listing["url"] for listing in gone] == ["https://vbo.nl/2"]
+
+
+def test_listings_of_a_skipped_page_are_not_gone(history):
+    first = page_batch("https://vbo.nl/oost", ["https://vbo.nl/1"])
+    first.extend(page_batch("https://vbo.nl/west", ["https://vbo.nl/3"]))
+    record(history, first, 1)
+    # The west search was unchanged and not read this time
+    record(history, page_batch("https://vbo.nl/oost", ["https://vbo.nl/1"]), 2)
+
+    assert not history.gone_since(moment(2))
+
+
+def test_page_read_without_listings_marks_them_gone(history):
+    record(history, page_batch("https://vbo.nl/oost", ["https://vbo.nl/1"]), 1)
+    record(history, page_batch("https://vbo.nl/oost", []), 2)
+
+    gone = history.gone_since(moment(2))
+    assert [listing["url"] for listing in gone] == ["https://vbo.nl/1"]
+
+
+def test_compaction_in_a_worker_thread(history):
+    record(history, page_batch("https://vbo.nl/oost", ["https://vbo.nl/1"]), 1)
+    record(history, page_batch("https://vbo.nl/oost", ["https://vbo.nl/1"]), 2)
+
+    async def compact():
+        return await run_blocking(compact_history_file, history.path, timeout=None)
+
+    # The store's own connection belongs to this thread, the worker opens one
+    removed = asyncio.run(compact())
+    assert removed + len(history) == 2
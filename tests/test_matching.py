@@ -0,0 +1,141 @@
+"""Blocking keys and cross-site links of the property matcher"""
+
+import sqlite3
+import pytest
+from househunt.listing import Listing, ListingBatch
+from househunt.matching import PropertyMatcher, blocking_keys
+from househunt.pipeline import listings_frame
+
+
+def test_blocking_keys_hold_city_and_postcode():
+    assert blocking_keys("Javastraat 12-1", "1094 AB Amsterdam (Oost)") == (
+        "amsterdam|javastraat|12|1",
+        "1094ab|12|1",
+    )
+    assert blocking_keys("Appartement Javastr. 12", "Amsterdam") == (
+        "amsterdam|javastr|12|",
+    )
+
+
+def test_blocking_keys_without_area_or_house_number():
+    # Streets of one name are in many towns, only a postcode files it
+    assert not blocking_keys("Kerkstraat 12")
+    assert blocking_keys("Kerkstraat 12, 2011 ZA") == ("2011za|12|",)
+    assert not blocking_keys("Kerkstraat", "2011 ZA Haarlem")
+
+
+@pytest.fixture(name="matcher")
+def fixture_matcher():
+    connection = sqlite3.connect(":memory:")
+    yield PropertyMatcher(connection)
+    connection.close()
+
+
+def frame(*listings):
+    return listings_frame(ListingBatch(listings))
+
+
+def register(matcher, listings_df):
+    new, duplicates = matcher.split(listings_df)
+    matcher.commit(listings_df["URL"])
+    return new, duplicates
+
+
+PARARIUS = Listing(
+    "pararius",
+    "https://www.pararius.nl/1",
+    "Kerkstraat 12",
+    "€ 400.000 k.k.",
+    size="70 m²",
+    area="1017 GC Amsterdam (Centrum)",
+)
+
+
+def test_same_property_on_another_site_is_linked(matcher):
+    register(matcher, frame(PARARIUS))
+    new, duplicates = register(
+        matcher,
+        frame(
+            Listing(
+                "vbo",
+                "https://vbo.nl/1",
+                "Kerkstraat 12",
+                "€ 405.000 k.k.",
+                size="71 m²",
+                area="Amsterdam",
+            )
+        ),
+    )
+    assert new.empty
+    assert list(duplicates["duplicate_of"]) == [PARARIUS.url]
+
+
+def test_same_street_in_another_city_is_not_linked(matcher):
+    register(matcher, frame(PARARIUS))
+    new, duplicates = register(
+        matcher,
+        frame(
+            Listing(
+                "huislijn",
+                "https://www.huislijn.nl/1",
+                "Kerkstraat 12",
+                "€ 405.000 k.k.",
+                area="2011 ZA Haarlem",
+            )
+        ),
+    )
+    assert len(new) == 1
+    assert duplicates.empty
+
+
+def test_differing_postcodes_are_not_linked(matcher):
+    register(matcher, frame(PARARIUS))
+    new, _ = register(
+        matcher,
+        frame(
+            Listing(
+                "vbo",
+                "https://vbo.nl/1",
+                "Kerkstraat 12",
+                "€ 400.000 k.k.",
+                size="70 m²",
+                area="1016 AB Amsterdam",
+            )
+        ),
+    )
+    assert len(new) == 1
+
+
+def test_nothing_to_compare_is_not_linked(matcher):
+    # Without a price on one side and a size on the other
+    register(matcher, frame(PARARIUS))
+    new, _ = register(
+        matcher,
+        frame(
+            Listing(
+                "huislijn",
+                "https://www.huislijn.nl/1",
+                "Kerkstraat 12",
+                "Prijs op aanvraag",
+                area="1017 GC Amsterdam",
+            )
+        ),
+    )
+    assert len(new) == 1
+
+
+def test_listings_of_one_batch_are_linked(matcher):
+    new, duplicates = matcher.split(
+        frame(
+            PARARIUS,
+            Listing(
+                "huislijn",
+                "https://www.huislijn.nl/1",
+                "Kerkstraat 12",
+                "€ 399.000 k.k.",
+                area="1017 GC Amsterdam",
+            ),
+        )
+    )
+    assert list(new["URL"]) == [PARARIUS.url]
+    assert list(duplicates["duplicate_of"]) == [PARARIUS.url]
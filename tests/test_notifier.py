@@ -0,0 +1,108 @@
+"""Notifier against the local aiosmtpd server of househunt.smtp_debug"""
+
+import asyncio
+import socket
+import pytest
+from househunt.notifier import Notifier, SmtpConnection
+
+smtp_debug = pytest.importorskip("househunt.smtp_debug")
+
+LISTINGS = [
+    {
+        "address": "Javastraat 12",
+        "price": "€ 425.000 k.k.",
+        "URL": "https://vbo.nl/1",
+    },
+    {
+        "address": "Czaar Peterstraat 3",
+        "price": "€ 390.000 k.k.",
+        "URL": "https://vbo.nl/2",
+    },
+]
+RECIPIENTS = ["one@example.com", "two@example.com"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(name="server")
+def fixture_server():
+    controller = smtp_debug.start_server(port=free_port())
+    yield controller
+    controller.stop()
+
+
+def make_notifier(port, personalize=False):
+    connection = SmtpConnection("localhost", port, starttls=False, timeout=5)
+    return Notifier(
+        connection,
+        "househunt@example.com",
+        RECIPIENTS,
+        digest_window=0,
+        personalize=personalize,
+    )
+
+
+def test_one_envelope_reaches_every_recipient(server):
+    notifier = make_notifier(server.port)
+
+    async def send():
+        await notifier.notify(LISTINGS)
+        await notifier.close()
+
+    asyncio.run(send())
+
+    assert notifier.emails_sent == 1
+    (envelope,) = server.handler.messages
+    assert envelope.rcpt_tos == RECIPIENTS
+    content = envelope.content.decode("utf-8")
+    assert "To: one@example.com, two@example.com" in content
+    assert "https://vbo.nl/2" in content
+
+
+def test_personalized_sends_one_message_per_recipient(server):
+    notifier = make_notifier(server.port, personalize=True)
+
+    async def send():
+        await notifier.notify(LISTINGS)
+        await notifier.close()
+
+    asyncio.run(send())
+
+    assert notifier.emails_sent == 2
+    assert [envelope.rcpt_tos for envelope in server.handler.messages] == [
+        [recipient] for recipient in RECIPIENTS
+    ]
+    for envelope, recipient in zip(server.handler.messages, RECIPIENTS):
+        assert f"To: {recipient}" in envelope.content.decode("utf-8")
+
+
+def test_reconnects_after_the_connection_dropped(server):
+    notifier = make_notifier(server.port)
+
+    async def send():
+        await notifier.notify(LISTINGS[:1])
+        # The server hangs up on the idle connection
+        notifier.connection._smtp.sock.close()  # pylint: disable=protected-access
+        await notifier.notify(LISTINGS[1:])
+        await notifier.close()
+
+    asyncio.run(send())
+
+    assert notifier.emails_sent == 2
+    assert len(server.handler.messages) == 2
+
+
+def test_failed_send_keeps_the_listings_queued():
+    notifier = make_notifier(free_port())
+
+    async def send():
+        await notifier.notify(LISTINGS)
+
+    asyncio.run(send())
+
+    assert notifier.emails_sent == 0
+    assert notifier._pending == LISTINGS  # pylint: disable=protected-access
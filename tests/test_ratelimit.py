@@ -0,0 +1,32 @@
+"""Circuit breaker of the rate limited fetcher around cancelled fetches"""
+
+import asyncio
+from househunt.ratelimit import HostLimiter, RateLimitedFetcher
+
+URL = "https://vbo.nl/aanbod"
+
+
+class HangingFetcher:
+    """fetcher whose requests never finish"""
+
+    name = "hanging"
+
+    async def fetch(self, url, selector=None):
+        await asyncio.Event().wait()
+
+
+def test_cancelled_trial_lets_the_host_be_tried_again():
+    limiter = HostLimiter(min_interval=0, breaker_threshold=1, breaker_cooldown=0)
+    fetcher = RateLimitedFetcher(HangingFetcher(), limiter, retries=1)
+
+    async def cancel_trial():
+        breaker = limiter.breakers["vbo.nl"]
+        breaker.failed(asyncio.get_running_loop().time())
+        task = asyncio.create_task(fetcher.fetch(URL))
+        await asyncio.sleep(0)
+        assert breaker.trial
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return limiter.allow(URL)
+
+    assert asyncio.run(cancel_trial())
@@ -0,0 +1,127 @@
+"""Notification rules checked against normalized batches"""
+
+import json
+import pytest
+from househunt.listing import Listing, ListingBatch
+from househunt.pipeline import listings_frame
+from househunt.rules import Rule, RuleSet, load_rules
+
+LISTINGS = [
+    Listing(
+        "vbo",
+        "https://vbo.nl/1",
+        "Javastraat 12",
+        "€ 425.000 k.k.",
+        size="70 m²",
+        energy_label="B",
+        area="1094 AB Amsterdam (Oost)",
+    ),
+    Listing(
+        "pararius",
+        "https://www.pararius.nl/2",
+        "Bos en Lommerweg 3",
+        "€ 390.000 k.k.",
+        size="45 m²",
+        energy_label="E",
+        area="1055 DT Amsterdam (Bos en Lommer)",
+    ),
+    # Huislijn shows neither size nor label
+    Listing(
+        "huislijn",
+        "https://www.huislijn.nl/3",
+        "Bijlmerdreef 7",
+        "€ 610.000 k.k.",
+        area="1103 TW Amsterdam (Zuidoost)",
+    ),
+]
+
+
+@pytest.fixture(name="listings_df")
+def fixture_listings_df():
+    return listings_frame(ListingBatch(LISTINGS))
+
+
+def matched_urls(rule, listings_df):
+    matched = RuleSet([rule]).matches(listings_df)[:, 0]
+    return list(listings_df["URL"][matched])
+
+
+def test_thresholds(listings_df):
+    assert matched_urls(Rule("cheap", max_price=400000), listings_df) == [
+        "https://www.pararius.nl/2"
+    ]
+    assert matched_urls(Rule("roomy", min_size=60), listings_df) == [
+        "https://vbo.nl/1",
+        "https://www.huislijn.nl/3",
+    ]
+    assert matched_urls(Rule("label", min_energy_label="C"), listings_df) == [
+        "https://vbo.nl/1",
+        "https://www.huislijn.nl/3",
+    ]
+
+
+def test_missing_values_are_not_held_against_a_listing(listings_df):
+    rule = Rule("strict", min_size=60, max_price_per_m2=7000, min_energy_label="A")
+    assert "https://www.huislijn.nl/3" in matched_urls(rule, listings_df)
+
+
+def test_areas_match_the_address_and_the_area(listings_df):
+    oost = Rule("oost", include_areas=["(oost)", "1055"])
+    assert matched_urls(oost, listings_df) == [
+        "https://vbo.nl/1",
+        "https://www.pararius.nl/2",
+    ]
+    assert matched_urls(
+        Rule("no-zuidoost", exclude_areas=["Zuidoost", "Javastraat"]), listings_df
+    ) == ["https://www.pararius.nl/2"]
+    assert matched_urls(Rule("sites", sites=["huislijn"]), listings_df) == [
+        "https://www.huislijn.nl/3"
+    ]
+
+
+def test_apply_keeps_matches_best_scored_first(listings_df):
+    rules = RuleSet(
+        [Rule("cheap", max_price=400000), Rule("roomy", min_size=60)],
+        weights={"size_m2": 1},
+    )
+    notable = rules.apply(listings_df)
+    assert list(notable["URL"]) == [
+        "https://vbo.nl/1",
+        "https://www.pararius.nl/2",
+        "https://www.huislijn.nl/3",
+    ]
+    assert list(notable["matched_rule"]) == ["roomy", "cheap", "roomy"]
+
+
+def test_apply_to_an_empty_batch(listings_df):
+    rules = RuleSet([Rule("cheap", max_price=400000)], weights={"size_m2": 1})
+    assert rules.apply(listings_df.iloc[:0]).empty
+    assert RuleSet().apply(listings_df.iloc[:0]).empty
+
+
+def test_without_rules_every_listing_matches(listings_df):
+    assert len(RuleSet().apply(listings_df)) == len(LISTINGS)
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"rules": [{"name": "typo", "max_prise": 400000}]},
+        {"rules": [{"name": "label", "min_energy_label": "Z"}]},
+        {"rules": [{"name": "text", "max_price": "400000"}]},
+        {"rules": [{"name": "areas", "include_areas": "Oost"}]},
+        {"rules": [], "weights": {"size_m2": "1"}},
+    ],
+)
+def test_invalid_rules_raise_value_error(tmp_path, config):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(config), encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_rules(str(path))
+
+
+def test_unreadable_json_raises_value_error(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text('{"rules": [', encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_rules(str(path))
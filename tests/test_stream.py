@@ -0,0 +1,35 @@
+"""Searches handed out by the stream around the run deadline"""
+
+import asyncio
+from househunt.stream import SearchStream
+
+# Seconds each search takes to crawl
+CRAWL_SECONDS = {"fast": 0, "second": 0.01, "third": 0.02, "slow": 10}
+
+
+def test_finished_searches_are_handed_out_after_the_deadline():
+    async def produce(search):
+        await asyncio.sleep(CRAWL_SECONDS[search])
+        return f"{search} listings"
+
+    async def consume():
+        results = []
+        async with SearchStream(
+            list(CRAWL_SECONDS), produce, queue_size=1, deadline=0.2
+        ) as stream:
+            async for search, batch in stream:
+                results.append((search, batch))
+                # Storing the first one outlasts the deadline, the other
+                # finished crawls wait in or in front of the queue
+                if len(results) == 1:
+                    await asyncio.sleep(0.3)
+        return results, stream.unfinished
+
+    results, unfinished = asyncio.run(consume())
+
+    assert results == [
+        ("fast", "fast listings"),
+        ("second", "second listings"),
+        ("third", "third listings"),
+    ]
+    assert unfinished == ["slow"]
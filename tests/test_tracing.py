@@ -0,0 +1,40 @@
+"""Run log records per site and for the work of no site"""
+
+import json
+from househunt.tracing import RUN_SITE, Tracer
+
+
+def test_run_site_report_only_takes_the_work_of_no_site(tmp_path):
+    tracer = Tracer()
+    with tracer.span("history_compact"):
+        pass
+    with tracer.span("parse", site="vbo"):
+        pass
+    tracer.count("items_parsed", 30, site="vbo")
+    path = tmp_path / "run_log.jsonl"
+
+    record = tracer.write_run_log(RUN_SITE, path=path)
+
+    assert list(record["stages"]) == ["run.history_compact"]
+    assert not record["counters"]
+    # The site's run is left for its own report
+    assert [span["site"] for span in tracer.spans] == ["vbo"]
+    assert tracer.write_run_log("vbo", path=path)["counters"] == {
+        "vbo": {"items_parsed": 30}
+    }
+    assert not tracer.spans and not tracer.counters
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["site"] for line in lines] == [RUN_SITE, "vbo"]
+
+
+def test_report_of_every_site(tmp_path):
+    tracer = Tracer()
+    with tracer.span("sheet_read"):
+        pass
+    with tracer.span("parse", site="vbo"):
+        pass
+
+    record = tracer.write_run_log(path=tmp_path / "run_log.jsonl")
+
+    assert sorted(record["stages"]) == ["run.sheet_read", "vbo.parse"]
+    assert not tracer.spans